@@ -1,26 +1,21 @@
 # pages/1_Career_Explorer.py
 
 import streamlit as st
-import json
 
 from theme import apply_theme
-from spark_conversation import run_spark_turn, conversation_is_complete
-
-from match_student_to_careers import (
-    extract_traits,
-    get_embedding,
-    match_careers,
-    build_report,
-    career_embeddings
-)
+from admission import Overloaded, feedback, scheduler
+from spark_conversation import new_conversation_context
 
-from db import update_user
+from resources import shared_catalog, trace_session
+from spark_flow import GREETING, build_results, final_results, run_turn, save_results
+from speculative import SpeculativeProfiler
 
 
 # ======================================================
 # THEME
 # ======================================================
 apply_theme()
+trace_session()
 
 st.markdown(
     """
@@ -50,21 +45,37 @@ if "spark_results" not in st.session_state:
 if "saved_careers" not in st.session_state:
     st.session_state.saved_careers = []
 
+if "spark_profiler" not in st.session_state:
+    # builds traits / matches in the background after every student message
+    st.session_state.spark_profiler = SpeculativeProfiler(shared_catalog(), top_k=5)
+
+if "turn_traits" not in st.session_state:
+    # trait profile accumulated from structured chat turns
+    st.session_state.turn_traits = None
+
+if "spark_context" not in st.session_state:
+    # keeps Groq prompts bounded: recent turns verbatim + rolling summary
+    st.session_state.spark_context = new_conversation_context()
+
 user_id = st.session_state.get("user_id")
 
 
+def reset_conversation():
+    # the old profiler's in-flight work is superseded — stop it
+    st.session_state.spark_profiler.cancel()
+    st.session_state.chat_history = []
+    st.session_state.summary_ready = False
+    st.session_state.spark_results = None
+    st.session_state.turn_traits = None
+    st.session_state.spark_profiler = SpeculativeProfiler(shared_catalog(), top_k=5)
+    st.session_state.spark_context = new_conversation_context()
+
+
 # ======================================================
 # INITIAL MESSAGE
 # ======================================================
 if not st.session_state.chat_history:
-    st.session_state.chat_history.append({
-        "role": "assistant",
-        "content": (
-            "Hey, I’m Spark ✨ Tell me about something creative you naturally "
-            "gravitate toward—TikToks, dance, music, fashion, film, design… "
-            "whatever feels most you."
-        )
-    })
+    st.session_state.chat_history.append({"role": "assistant", "content": GREETING})
 
 
 # ======================================================
@@ -87,23 +98,44 @@ else:
 # ======================================================
 # PROCESS USER TURN
 # ======================================================
+def show_queue_position(placeholder):
+    # called while this turn waits for model quota (busy classroom)
+    return lambda pos: placeholder.info(
+        f"⏳ Lots of students are chatting with Spark right now — you're #{pos} in line…"
+    )
+
+
+def overloaded():
+    st.warning("Spark is swamped right now — give it a few seconds and try again. 💛")
+    st.stop()
+
+
 if user_input:
 
     # add user message
     st.session_state.chat_history.append({"role": "user", "content": user_input})
-
-    # run Spark via Groq
-    spark_reply, _, _, ready_flag = run_spark_turn(
-        st.session_state.chat_history,
-        profile={},   # not used in Groq version
-        phase="chat"
-    )
-
-    # add Spark reply
-    st.session_state.chat_history.append({"role": "assistant", "content": spark_reply})
+    with st.chat_message("user"):
+        st.write(user_input)
+
+    # run Spark via Groq, rendering tokens as they arrive
+    with st.chat_message("assistant"):
+        waiting = st.empty()
+        try:
+            with feedback(show_queue_position(waiting)):
+                ready_flag, st.session_state.turn_traits = run_turn(
+                    st.session_state.chat_history,
+                    st.session_state.spark_context,
+                    st.session_state.spark_profiler,
+                    st.session_state.turn_traits,
+                    render=st.write_stream
+                )
+        except Overloaded:
+            st.session_state.chat_history.pop()
+            overloaded()
+        waiting.empty()
 
     # determine if conversation has enough data
-    if ready_flag or conversation_is_complete(spark_reply):
+    if ready_flag:
         st.session_state.summary_ready = True
 
     st.rerun()
@@ -112,79 +144,51 @@ if user_input:
 # ======================================================
 # FINAL STEP — BUILD RESULTS ONCE
 # ======================================================
-if st.session_state.summary_ready and st.session_state.spark_results is None:
+def build_results_now(chat_history, catalog, traits):
+    with st.status("Got it — pulling together your creative vibe… ✨", expanded=True) as status:
+        preview = st.empty()
 
-    with st.spinner("Got it — pulling together your creative vibe… ✨"):
+        ahead = scheduler.backlog()
+        if ahead:
+            status.write(f"⏳ Busy moment — {ahead} requests ahead of yours, hang tight…")
 
-        # gather all user text
-        user_text = " ".join(
-            m["content"] for m in st.session_state.chat_history if m["role"] == "user"
-        )
+        # embedding, traits and matching run concurrently; show each piece
+        # as soon as it lands
+        def show(stage, value):
+            if stage == "matches":
+                preview.markdown(
+                    "**Early matches:** " + ", ".join(title for title, _ in value[:3])
+                )
+            elif stage == "traits":
+                status.write("✔ Creative traits extracted")
+            elif stage == "persona":
+                status.write(f"✔ Persona: **{value['name']}**")
 
-        # extract traits
-        traits_chat = [
-            {"role": "assistant", "content": "You are Spark, an entertainment career coach."},
-            {"role": "user", "content": user_text},
-        ]
+        results = build_results(chat_history, catalog, traits, on_stage=show)
+        status.update(label="Your SparkPath is ready ✨", state="complete")
 
-        traits = extract_traits(traits_chat)
+    return results
 
-        # build embedding
-        embedding_payload = (
-            json.dumps(traits.get("interests", {})) + " " +
-            json.dumps(traits.get("transferable_skills", {})) + " " +
-            " ".join(traits.get("passion_signals", [])) + " " +
-            user_text
-        )
 
-        emb = get_embedding(embedding_payload)
-        matches = match_careers(emb, career_embeddings)
-
-        # persona
-        def infer_persona(tr, text):
-            blob = (tr.get("vibe_summary", "") + " " + text).lower()
-
-            if any(w in blob for w in ["dance", "movement", "choreo"]):
-                return {"name": "The Movement Storyteller",
-                        "blurb": "You express emotion through movement and rhythm."}
-
-            if any(w in blob for w in ["camera", "film", "edit", "video"]):
-                return {"name": "The Visual Storyteller",
-                        "blurb": "You see stories in scenes, angles, and imagery."}
-
-            if any(w in blob for w in ["music", "sound", "audio", "producer"]):
-                return {"name": "The Music Architect",
-                        "blurb": "You shape emotion through sound and audio textures."}
-
-            if any(w in blob for w in ["write", "script", "story"]):
-                return {"name": "The Story Weaver",
-                        "blurb": "You craft narratives with ideas and words."}
-
-            return {"name": "The Creative Explorer",
-                    "blurb": "You’re multi-curious — Spark helps you discover your path."}
-
-        persona = infer_persona(traits, user_text)
-        report = build_report(traits, matches)
-
-        # save results
-        st.session_state.spark_results = {
-            "traits": traits,
-            "matches": matches,
-            "persona": persona,
-            "report": report,
-        }
-
-        # save to DynamoDB
-        if user_id:
-            update_user(
-                user_id,
-                {
-                    "answers": {"chat_history": st.session_state.chat_history},
-                    "traits": traits,
-                    "persona": persona,
-                    "matches": matches,
-                }
+if st.session_state.summary_ready and st.session_state.spark_results is None:
+
+    try:
+        with st.spinner("Got it — pulling together your creative vibe… ✨"):
+            results = final_results(
+                st.session_state.chat_history,
+                shared_catalog(),
+                st.session_state.spark_profiler,
+                traits=st.session_state.turn_traits,
+                build=build_results_now
             )
+    except Overloaded:
+        overloaded()      # summary_ready stays set, so the next rerun retries
+
+    # save results
+    st.session_state.spark_results = results
+
+    # save to DynamoDB (background — not on the critical path)
+    save_results(user_id, st.session_state.chat_history, results)
 
     st.rerun()
 
@@ -211,6 +215,9 @@ if st.session_state.spark_results:
 
     st.markdown("## 🎯 Your Top Career Matches")
 
+    if results.get("fallback") == "lexical":
+        st.caption("Matched from the words you used — our AI matcher was busy. Chat again later for a deeper match.")
+
     for i, (title, score) in enumerate(matches[:3]):
         st.markdown(
             f"""
@@ -233,3 +240,7 @@ if st.session_state.spark_results:
     st.markdown("## 📄 Full SparkPath Report")
     st.code(results["report"])
 
+    if st.button("🔄 Start a new chat"):
+        reset_conversation()
+        st.rerun()
+
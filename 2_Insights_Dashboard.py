@@ -1,11 +1,19 @@
 # pages/2_Insights_Dashboard.py
 
+import os
+
 import streamlit as st
 import pandas as pd
 from theme import apply_theme
+import aws_clients
+import tracing
 
 apply_theme()
 
+# Pool stats and traces from every session — only for operators.
+# Start Streamlit with SPARK_OPERATOR_VIEW=1 to show the sidebar toggle.
+OPERATOR_VIEW = os.getenv("SPARK_OPERATOR_VIEW", "0") == "1"
+
 st.markdown(
     """
     <h2 style="font-size:32px; font-weight:700; margin-bottom:4px;">
@@ -18,6 +26,56 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# ========== OPERATOR VIEW ==========
+def render_operator_view():
+    st.markdown("### 🛠 AWS Connection Pools")
+    pools = aws_clients.pool_stats()
+    if pools:
+        st.dataframe(pd.DataFrame(pools).set_index("client"), use_container_width=True)
+    else:
+        st.caption("No AWS clients created in this process yet.")
+
+    st.markdown("### 🛠 Latency Traces")
+
+    if not tracing.ENABLED:
+        st.info("Tracing is off for this process — start Streamlit with SPARK_TRACE=1.")
+
+    spans = tracing.load_spans()
+    if not spans:
+        st.warning(f"No spans in {tracing.TRACE_PATH} yet.")
+        return
+
+    n_sessions = st.slider("Recent sessions", 5, 200, 20)
+    sessions = tracing.recent_sessions(spans, n_sessions)
+    wanted = set(sessions)
+    window = [s for s in spans if s.get("session") in wanted] or spans
+
+    st.markdown("#### Per-stage latency (ms)")
+    st.dataframe(
+        pd.DataFrame(tracing.stage_percentiles(window)).set_index("stage").round(1),
+        use_container_width=True
+    )
+
+    st.markdown("#### Where each session spent its time (ms)")
+    breakdown = tracing.session_breakdown(window, sessions)
+    df_sessions = pd.DataFrame.from_dict(breakdown, orient="index").fillna(0.0)
+    df_sessions = df_sessions[[c for c in tracing.STAGES if c in df_sessions]
+                              + [c for c in df_sessions if c not in tracing.STAGES]]
+    st.bar_chart(df_sessions)
+
+    errors = [s for s in window if "error" in s]
+    if errors:
+        st.markdown("#### Recent errors")
+        st.dataframe(
+            pd.DataFrame(errors[-50:])[["ts", "session", "span", "ms", "error"]],
+            use_container_width=True
+        )
+
+
+if OPERATOR_VIEW and st.sidebar.toggle("🛠 Operator view", value=False):
+    render_operator_view()
+    st.stop()
+
 # Load Spark results
 if "spark_results" not in st.session_state or st.session_state.spark_results is None:
     st.warning("No results yet. Run the 🎤 Career Explorer first.")
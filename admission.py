@@ -0,0 +1,298 @@
+# admission.py
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from tracing import current_session
+
+
+# ============================================================
+#  PROCESS-WIDE ADMISSION CONTROL
+# ============================================================
+# Every Groq / Bedrock call takes a token from its model's bucket and its
+# account's bucket before it goes out. When the buckets are empty, calls
+# wait in a bounded queue that is served round-robin across sessions, so
+# a classroom clicking at once is paced at the quota ceiling instead of
+# bouncing off provider throttling, and one busy session can't starve the
+# others. Waiters can report their place in line to the UI (feedback()).
+#
+#   SPARK_QUOTAS_RPM='{"groq": 30, "llama-3.1-8b-instant": 30}'   overrides
+#   SPARK_ADMISSION_QUEUE=200     calls allowed to wait at once
+#   SPARK_ADMISSION_TIMEOUT=60    seconds a call may wait before Overloaded
+#   SPARK_ADMISSION=0             no pacing at all
+
+ADMISSION = os.getenv("SPARK_ADMISSION", "1") != "0"
+MAX_QUEUE = int(os.getenv("SPARK_ADMISSION_QUEUE", "200"))
+WAIT_TIMEOUT = float(os.getenv("SPARK_ADMISSION_TIMEOUT", "60"))
+
+# requests per minute — set these to the account's actual limits
+DEFAULT_QUOTAS_RPM = {
+    "groq": 300,
+    "bedrock": 1200,
+    "llama-3.1-8b-instant": 300,
+    "amazon.titan-embed-text-v2:0": 1000,
+    "amazon.nova-micro-v1:0": 500,
+}
+BURST_SECONDS = 2.0       # a full bucket holds this many seconds of quota
+
+
+class Overloaded(RuntimeError):
+    """The admission queue is full, or a call waited past WAIT_TIMEOUT or its CallBudget."""
+
+
+class TokenBucket:
+    """Refills so that a full burst plus a minute of refill stays within
+    per_minute — providers count requests over a sliding minute."""
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.capacity = max(1.0, per_minute * burst_seconds / 60.0)
+        self.rate = max(per_minute - self.capacity, 1.0) / 60.0
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if it is now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1.0
+
+
+class _Ticket:
+    __slots__ = ("session", "keys", "buckets", "admitted")
+
+    def __init__(self, session, keys, buckets):
+        self.session = session
+        self.keys = keys
+        self.buckets = buckets
+        self.admitted = threading.Event()
+
+
+_on_wait = contextvars.ContextVar("spark_admission_feedback", default=None)
+_call_budget = contextvars.ContextVar("spark_admission_budget", default=None)
+
+
+class CallBudget:
+    """Deadline for one logical call; records whether it had to queue."""
+
+    __slots__ = ("seconds", "deadline", "queued_at", "queued_ms")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.queued_at = None     # set while the call waits in the queue
+        self.queued_ms = 0.0      # finished waits
+
+    def remaining(self):
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def queued(self):
+        """Seconds spent waiting for quota so far, including a wait in progress."""
+        started = self.queued_at
+        ongoing = time.monotonic() - started if started is not None else 0.0
+        return self.queued_ms / 1000 + ongoing
+
+
+@contextlib.contextmanager
+def within(budget):
+    """acquire() calls inside the block give up (Overloaded) at budget.deadline,
+    so a caller that stops waiting doesn't leave its call in the queue."""
+    token = _call_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _call_budget.reset(token)
+
+
+@contextlib.contextmanager
+def feedback(on_wait):
+    """Calls made inside the block report on_wait(position) while queued."""
+    token = _on_wait.set(on_wait)
+    try:
+        yield
+    finally:
+        _on_wait.reset(token)
+
+
+class AdmissionScheduler:
+    def __init__(self, quotas_rpm, max_queue=MAX_QUEUE):
+        self._buckets = {name: TokenBucket(rpm) for name, rpm in quotas_rpm.items() if rpm}
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()     # session → deque of tickets, in round-robin order
+        self._size = 0
+        self._dispatcher = None
+        self.admitted = 0
+        self.rejected = 0
+
+    # --------------------------------------------------------
+    #  callers
+    # --------------------------------------------------------
+    def acquire(self, account, model, timeout=WAIT_TIMEOUT):
+        """Block until `model` and `account` both have quota; returns seconds queued.
+
+        Raises Overloaded if the queue is full or the wait exceeds `timeout`.
+        """
+        keys = tuple(k for k in (account, model) if k in self._buckets)
+        if not keys:
+            return 0.0
+        buckets = [self._buckets[k] for k in keys]
+
+        budget = _call_budget.get()
+        if budget is not None:
+            timeout = min(timeout, budget.remaining())
+
+        session = current_session() or "default"
+        with self._cond:
+            if self._size == 0 and self._take(buckets):
+                self.admitted += 1
+                return 0.0
+            if self._size >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"admission queue full ({self._size} waiting)")
+
+            ticket = _Ticket(session, keys, buckets)
+            self._queues.setdefault(session, deque()).append(ticket)
+            self._size += 1
+            self._start_dispatcher()
+            self._cond.notify_all()
+
+        start = time.monotonic()
+        if budget is not None:
+            budget.queued_at = start
+        try:
+            self._wait(ticket, timeout)
+        finally:
+            if budget is not None:
+                budget.queued_ms += (time.monotonic() - start) * 1000
+                budget.queued_at = None
+        return time.monotonic() - start
+
+    def try_acquire(self, account, model):
+        """Take quota only if it is free right now and nobody is queued (hedges)."""
+        buckets = [self._buckets[k] for k in (account, model) if k in self._buckets]
+        with self._cond:
+            if self._size == 0 and self._take(buckets):
+                self.admitted += 1
+                return True
+            return False
+
+    def backlog(self, key=None):
+        """Calls waiting — all of them, or only those that need `key`'s quota."""
+        with self._cond:
+            if key is None:
+                return self._size
+            return sum(key in t.keys for q in self._queues.values() for t in q)
+
+    def position(self, ticket):
+        """Calls served before this one under round-robin (1 = next)."""
+        with self._cond:
+            own = self._queues.get(ticket.session)
+            if own is None or ticket not in own:
+                return 0
+            idx = own.index(ticket)
+            return 1 + sum(min(len(q), idx + 1) for s, q in self._queues.items()
+                           if s != ticket.session) + idx
+
+    def _wait(self, ticket, timeout):
+        on_wait = _on_wait.get()
+        deadline = time.monotonic() + timeout
+        last = None
+        while not ticket.admitted.wait(timeout=min(0.25, max(deadline - time.monotonic(), 0.0))):
+            if time.monotonic() >= deadline:
+                with self._cond:
+                    if ticket.admitted.is_set():
+                        return
+                    self._remove(ticket)
+                    self.rejected += 1
+                raise Overloaded(f"waited {timeout:g}s for model quota")
+            if on_wait is not None:
+                pos = self.position(ticket)
+                if pos and pos != last:
+                    last = pos
+                    try:
+                        on_wait(pos)
+                    except Exception:
+                        pass
+
+    # --------------------------------------------------------
+    #  dispatcher (one daemon thread, started on first queueing)
+    # --------------------------------------------------------
+    def _take(self, buckets):
+        now = time.monotonic()
+        if any(b.wait_time(now) > 0 for b in buckets):
+            return False
+        for b in buckets:
+            b.take()
+        return True
+
+    def _remove(self, ticket):
+        q = self._queues.get(ticket.session)
+        if q is not None and ticket in q:
+            q.remove(ticket)
+            self._size -= 1
+            if not q:
+                del self._queues[ticket.session]
+
+    def _start_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, name="spark-admission", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                if self._size == 0:
+                    self._cond.wait()
+                    continue
+
+                soonest = None
+                now = time.monotonic()
+                for session in list(self._queues):
+                    head = self._queues[session][0]
+                    wait_for = max(b.wait_time(now) for b in head.buckets)
+                    if wait_for == 0:
+                        for b in head.buckets:
+                            b.take()
+                        self._queues[session].popleft()
+                        self._size -= 1
+                        if self._queues[session]:
+                            self._queues.move_to_end(session)     # next session's turn
+                        else:
+                            del self._queues[session]
+                        self.admitted += 1
+                        head.admitted.set()
+                        break
+                    soonest = wait_for if soonest is None else min(soonest, wait_for)
+                else:
+                    self._cond.wait(timeout=soonest)
+
+
+def _load_quotas():
+    quotas = dict(DEFAULT_QUOTAS_RPM)
+    raw = os.getenv("SPARK_QUOTAS_RPM")
+    if raw:
+        quotas.update(json.loads(raw))
+    return quotas
+
+
+scheduler = AdmissionScheduler(_load_quotas() if ADMISSION else {})
+
+
+def acquire(account, model):
+    return scheduler.acquire(account, model)
+
+
+def try_acquire(account, model):
+    return scheduler.try_acquire(account, model)
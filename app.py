@@ -1,13 +1,18 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import os
 from theme import apply_theme, render_sidebar
 from db import create_user, get_user
+from resources import start_warm_up, static_asset, trace_session
+
+# Build the shared catalog / clients in the background on the first run
+start_warm_up()
+trace_session()
 
 # ======================================================
 # USER ID
 # ======================================================
 if "user_id" not in st.session_state:
+    # just an id — the DynamoDB item appears with the user's first saved results
     st.session_state.user_id = create_user()
 
 # ======================================================
@@ -25,12 +30,9 @@ apply_theme()
 # ======================================================
 # 🌌 LOAD GALAXY GRAPH HTML
 # ======================================================
-html_path = os.path.join(os.path.dirname(__file__), "career_map.html")
-
-if os.path.exists(html_path):
-    with open(html_path, "r", encoding="utf-8") as f:
-        galaxy_html = f.read()
+galaxy_html = static_asset("career_map.html")   # read once per process
 
+if galaxy_html:
     # Full-width hero galaxy map
     components.html(galaxy_html, height=550, scrolling=False)
 
@@ -0,0 +1,125 @@
+# aws_clients.py
+import os
+import threading
+
+
+# ============================================================
+#  SHARED AWS CLIENTS
+# ============================================================
+# One boto3 session and one client per (service, region) for the whole
+# process. botocore clients are thread-safe, so every session, worker
+# thread and builder shares the same urllib3 pool instead of queueing on
+# the default 10 connections or paying a fresh TLS handshake per client.
+#
+#   SPARK_AWS_PROFILE=name          named profile (default credential chain if unset)
+#   SPARK_AWS_MAX_POOL=64           pooled connections per host
+#   SPARK_AWS_CONNECT_TIMEOUT=3     seconds
+#   SPARK_AWS_READ_TIMEOUT=30       seconds
+#   SPARK_AWS_MAX_ATTEMPTS=3        including the first; adaptive retry mode
+#
+# boto3 is imported on first use, so importing this module stays offline
+# and cheap (check_import_time.py).
+
+AWS_PROFILE = os.getenv("SPARK_AWS_PROFILE")
+MAX_POOL_CONNECTIONS = int(os.getenv("SPARK_AWS_MAX_POOL", "64"))
+CONNECT_TIMEOUT = float(os.getenv("SPARK_AWS_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("SPARK_AWS_READ_TIMEOUT", "30"))
+MAX_ATTEMPTS = int(os.getenv("SPARK_AWS_MAX_ATTEMPTS", "3"))
+
+_session = None
+_clients = {}
+_resources = {}
+_lock = threading.Lock()      # boto3 sessions are not thread-safe; creation is serialized
+
+
+def client_config():
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},
+        tcp_keepalive=True,
+    )
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import boto3   # ~200 ms, only paid by the first AWS call
+
+        _session = boto3.Session(profile_name=AWS_PROFILE) if AWS_PROFILE else boto3.Session()
+    return _session
+
+
+def get_client(service, region):
+    key = (service, region)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _get_session().client(service, region_name=region, config=client_config())
+                _clients[key] = client
+    return client
+
+
+def get_resource(service, region):
+    """boto3 resource on the same tuned config (e.g. DynamoDB tables).
+
+    Only use action methods (put_item, update_item, ...) from several
+    threads; lazy-loaded attributes are not thread-safe.
+    """
+    key = (service, region)
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = _get_session().resource(service, region_name=region, config=client_config())
+                _resources[key] = resource
+    return resource
+
+
+# ============================================================
+#  POOL METRICS
+# ============================================================
+
+def _pool_managers(client):
+    http = getattr(getattr(client, "_endpoint", None), "http_session", None)
+    if http is None:
+        return []
+    managers = [getattr(http, "_manager", None)]
+    managers.extend(getattr(http, "_proxy_managers", {}).values())
+    return [m for m in managers if m is not None]
+
+
+def pool_stats():
+    """One row per shared client: connections in use / idle / ever opened.
+
+    `opened` creeping up under steady load means connections are being
+    dropped and re-handshaken; `in_use` at `max_pool` means callers queue.
+    """
+    with _lock:
+        named = [(f"{s}@{r}", c) for (s, r), c in _clients.items()]
+        named += [(f"{s}@{r} (resource)", res.meta.client) for (s, r), res in _resources.items()]
+
+    rows = []
+    for name, client in named:
+        row = {"client": name, "max_pool": MAX_POOL_CONNECTIONS,
+               "hosts": 0, "in_use": 0, "idle": 0, "opened": 0, "requests": 0}
+        for manager in _pool_managers(client):
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None or pool.pool is None:
+                    continue
+                free = pool.pool.qsize()                                  # idle + never-used slots
+                idle = sum(conn is not None for conn in list(pool.pool.queue))
+                row["hosts"] += 1
+                row["in_use"] += pool.pool.maxsize - free
+                row["idle"] += idle
+                row["opened"] += pool.num_connections
+                row["requests"] += pool.num_requests
+        rows.append(row)
+    return rows
@@ -0,0 +1,437 @@
+# backends.py
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from copy import deepcopy
+from types import SimpleNamespace
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+
+# ============================================================
+#  BACKEND SELECTION
+# ============================================================
+# SPARK_BACKEND=fake swaps Bedrock, Groq and DynamoDB for the in-process
+# stand-ins below — no network, no credentials. Every lazy client getter
+# (match_student_to_careers, spark_conversation, db, the builder) asks
+# fake_client() first.
+#
+# SPARK_FAKE_LATENCY_SCALE multiplies every injected delay (0 = instant).
+
+BACKEND = os.getenv("SPARK_BACKEND", "aws")
+LATENCY_SCALE = float(os.getenv("SPARK_FAKE_LATENCY_SCALE", "1"))
+
+_fakes = {}
+_fakes_lock = threading.Lock()
+
+
+def fake_client(kind):
+    """Shared fake for "bedrock", "groq" or "dynamodb" when SPARK_BACKEND=fake, else None."""
+    if BACKEND != "fake":
+        return None
+    with _fakes_lock:
+        if kind not in _fakes:
+            _fakes[kind] = FAKE_FACTORIES[kind]()
+        return _fakes[kind]
+
+
+def install_fakes(bedrock=None, groq=None, dynamodb=None):
+    """Point every module's lazy client at fakes (programmatic SPARK_BACKEND=fake)."""
+    global BACKEND
+    import db
+    import match_student_to_careers
+    import spark_conversation
+
+    BACKEND = "fake"
+    with _fakes_lock:
+        _fakes["bedrock"] = bedrock or FakeBedrockRuntime()
+        _fakes["groq"] = groq or FakeGroq()
+        _fakes["dynamodb"] = dynamodb or FakeDynamoTable()
+
+    from embedding_cache import EmbeddingCache
+
+    match_student_to_careers._bedrock = _fakes["bedrock"]
+    match_student_to_careers.embedding_cache = EmbeddingCache(path=None)
+    spark_conversation._client = _fakes["groq"]
+    db._table = _fakes["dynamodb"]
+    db._writer = None
+    return dict(_fakes)
+
+
+# ============================================================
+#  LATENCY / FAULT INJECTION
+# ============================================================
+
+class ProviderQuota:
+    """Requests-per-minute ceiling over a sliding minute, like the real services.
+
+    Share one between the LatencyProfiles of an account's operations.
+    """
+
+    def __init__(self, rpm, window=60.0):
+        self.rpm = rpm
+        self.window = window
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def allow(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] >= self.window:
+                self._calls.popleft()
+            if len(self._calls) >= self.rpm:
+                self.throttled += 1
+                return False
+            self._calls.append(now)
+            return True
+
+
+class LatencyProfile:
+    """Log-normal latency fitted to a median and p95, plus error injection.
+
+    error_rate     fraction of calls failing with a 500-style error
+    throttle_rate  fraction of calls rejected with a throttling error
+    quota          ProviderQuota; calls over it are throttled
+    """
+
+    def __init__(self, median=0.1, p95=0.3, error_rate=0.0, throttle_rate=0.0, seed=None,
+                 quota=None):
+        self.median = median
+        self.p95 = max(p95, median)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        sigma = math.log(self.p95 / self.median) / 1.645
+        with self._lock:
+            return self._rng.lognormvariate(math.log(self.median), sigma)
+
+    def roll(self):
+        """None, "throttle" or "error" for the next call."""
+        if self.quota is not None and not self.quota.allow():
+            return "throttle"
+        with self._lock:
+            r = self._rng.random()
+        if r < self.throttle_rate:
+            return "throttle"
+        if r < self.throttle_rate + self.error_rate:
+            return "error"
+        return None
+
+    def wait(self, scale=1.0):
+        delay = self.sample() * LATENCY_SCALE * scale
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def _aws_error(kind, operation):
+    if kind == "throttle":
+        code, status = "ThrottlingException", 429
+    else:
+        code, status = "InternalServerException", 500
+    return ClientError(
+        {"Error": {"Code": code, "Message": f"injected {kind}"},
+         "ResponseMetadata": {"HTTPStatusCode": status}},
+        operation
+    )
+
+
+def _groq_error(kind):
+    import groq
+    import httpx
+
+    status = 429 if kind == "throttle" else 500
+    request = httpx.Request("POST", "https://fake.groq.local/openai/v1/chat/completions")
+    response = httpx.Response(status, request=request)
+    cls = groq.RateLimitError if kind == "throttle" else groq.InternalServerError
+    return cls(f"injected {kind}", response=response, body=None)
+
+
+def _stable_seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+# ============================================================
+#  BEDROCK RUNTIME (Titan embeddings + Nova converse)
+# ============================================================
+
+KEYWORD_TRAITS = {
+    "film": ("interests", "video"), "video": ("interests", "video"), "edit": ("interests", "video"),
+    "music": ("interests", "music"), "beat": ("interests", "music"), "song": ("interests", "music"),
+    "write": ("interests", "writing"), "story": ("interests", "writing"),
+    "dance": ("interests", "performance"), "act": ("interests", "performance"),
+    "design": ("interests", "design"), "draw": ("interests", "design"), "fashion": ("interests", "design"),
+    "code": ("interests", "technology"), "game": ("interests", "technology"),
+    "business": ("interests", "entrepreneurship"), "sell": ("interests", "entrepreneurship"),
+    "customer": ("transferable_skills", "customer_service"), "cashier": ("transferable_skills", "customer_service"),
+    "team": ("transferable_skills", "collaboration"), "lead": ("transferable_skills", "leadership"),
+    "plan": ("transferable_skills", "organization"), "talk": ("transferable_skills", "communication"),
+}
+
+
+def fake_traits(text):
+    """Deterministic trait JSON in the TRAIT_SYSTEM_PROMPT schema."""
+    from match_student_to_careers import INTEREST_NAMES, SKILL_NAMES
+
+    rng = random.Random(_stable_seed(text))
+    traits = {
+        "transferable_skills": {k: rng.randint(0, 4) for k in SKILL_NAMES},
+        "interests": {k: rng.randint(0, 4) for k in INTEREST_NAMES},
+        "passion_signals": [],
+        "work_experience_summary": "",
+        "vibe_summary": "",
+    }
+
+    lower = text.lower()
+    for word, (group, name) in KEYWORD_TRAITS.items():
+        if word in lower:
+            traits[group][name] = rng.randint(7, 10)
+            if word not in traits["passion_signals"]:
+                traits["passion_signals"].append(word)
+
+    traits["work_experience_summary"] = "Has hands-on experience." if "work" in lower else ""
+    traits["vibe_summary"] = "Curious and creative, into " + (", ".join(traits["passion_signals"]) or "a bit of everything")
+    return traits
+
+
+class FakeBedrockRuntime:
+    """Stand-in for boto3's bedrock-runtime client.
+
+    invoke_model  deterministic unit-norm embedding seeded by the input text
+    converse      replays trait_responses in order if given, else fake_traits()
+    """
+
+    def __init__(self, embed_latency=None, converse_latency=None, trait_responses=None, dim=1024):
+        self.embed_latency = embed_latency or LatencyProfile(median=0.12, p95=0.35)
+        self.converse_latency = converse_latency or LatencyProfile(median=0.6, p95=1.5)
+        self._replay = itertools.cycle(trait_responses) if trait_responses else None
+        self._replay_lock = threading.Lock()
+        self.dim = dim
+        self.calls = {"invoke_model": 0, "converse": 0}
+
+    OPERATIONS = {"invoke_model": "InvokeModel", "converse": "Converse"}
+
+    def _enter(self, op, latency):
+        with self._replay_lock:
+            self.calls[op] += 1
+        fault = latency.roll()
+        latency.wait()
+        if fault:
+            raise _aws_error(fault, self.OPERATIONS[op])
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None, **kwargs):
+        self._enter("invoke_model", self.embed_latency)
+        req = json.loads(body)
+        dim = int(req.get("dimensions", self.dim))
+
+        rng = np.random.default_rng(_stable_seed(modelId + "|" + req["inputText"]))
+        vec = rng.standard_normal(dim)
+        vec /= np.linalg.norm(vec)
+
+        payload = json.dumps({"embedding": vec.tolist(), "inputTextTokenCount": len(req["inputText"]) // 4})
+        return {"body": io.BytesIO(payload.encode("utf-8")), "contentType": "application/json"}
+
+    def converse(self, modelId, messages, system=None, **kwargs):
+        self._enter("converse", self.converse_latency)
+        text = " ".join(c.get("text", "") for m in messages for c in m.get("content", []))
+        # only the transcript part of build_trait_prompt(), not the schema
+        transcript = text.split("Analyze this conversation:")[-1].split("Return JSON")[0]
+
+        if self._replay is not None:
+            with self._replay_lock:
+                out = next(self._replay)
+            out = out if isinstance(out, str) else json.dumps(out)
+        else:
+            out = json.dumps(fake_traits(transcript))
+
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": out}]}},
+            "usage": {"inputTokens": len(text) // 4, "outputTokens": len(out) // 4},
+            "stopReason": "end_turn",
+        }
+
+
+# ============================================================
+#  GROQ CHAT
+# ============================================================
+
+DEFAULT_FINAL_REPLY = (
+    "Love it! Based on our chat, here are three careers that fit your vibe: "
+    "Video Editor, Social Media Manager, and Music Producer."
+)
+
+
+class FakeGroq:
+    """Stand-in for groq.Groq: chat.completions.create (plain, JSON, streaming).
+
+    replies        canned assistant replies, replayed in order; by default it
+                   asks questions and wraps up after `ready_after` student turns
+    first_token    latency before the first token / the whole response
+    per_token      delay between streamed chunks
+    """
+
+    def __init__(self, replies=None, ready_after=3, first_token=None, per_token=0.01):
+        self.first_token = first_token or LatencyProfile(median=0.25, p95=0.8)
+        self.per_token = per_token
+        self.ready_after = ready_after
+        self._replay = itertools.cycle(replies) if replies else None
+        self._replay_lock = threading.Lock()
+        self.calls = 0
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(data=[SimpleNamespace(id="fake")]))
+
+    def _reply_for(self, messages):
+        if self._replay is not None:
+            with self._replay_lock:
+                return next(self._replay), None
+
+        user_turns = [m["content"] for m in messages if m["role"] == "user"]
+        if len(user_turns) >= self.ready_after:
+            return DEFAULT_FINAL_REPLY, True
+        return f"Ooh nice — tell me more! (question {len(user_turns) + 1})", False
+
+    def _create(self, model, messages, stream=False, response_format=None, max_tokens=None, **kwargs):
+        with self._replay_lock:
+            self.calls += 1
+        fault = self.first_token.roll()
+        self.first_token.wait()
+        if fault:
+            raise _groq_error(fault)
+
+        reply, ready = self._reply_for(messages)
+        system = " ".join(m["content"] for m in messages if m["role"] == "system")
+
+        if '"reply"' in system:
+            # structured turn — reply + ready + traits of the latest message
+            last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+            content = json.dumps({
+                "reply": reply,
+                "ready": bool(ready),
+                "traits": fake_traits(last),
+            })
+        else:
+            content = reply
+
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m["content"]) for m in messages) // 4,
+            completion_tokens=len(content) // 4,
+        )
+
+        if not stream:
+            message = SimpleNamespace(role="assistant", content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+        return self._stream(content)
+
+    def _stream(self, content):
+        for i in range(0, len(content), 8):
+            if i and self.per_token:
+                time.sleep(self.per_token * LATENCY_SCALE)
+            delta = SimpleNamespace(content=content[i:i + 8])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+# ============================================================
+#  DYNAMODB TABLE
+# ============================================================
+
+def _check_no_floats(value, path="item"):
+    # boto3's serializer rejects floats; keep the fake just as strict
+    if isinstance(value, float):
+        raise TypeError(f"Float types are not supported. Use Decimal types instead ({path})")
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _check_no_floats(v, f"{path}.{k}")
+    elif isinstance(value, (list, tuple, set)):
+        for i, v in enumerate(value):
+            _check_no_floats(v, f"{path}[{i}]")
+
+
+class FakeDynamoTable:
+    """In-memory stand-in for a boto3 DynamoDB Table resource (spark_users)."""
+
+    def __init__(self, latency=None, key="user_id"):
+        self.latency = latency or LatencyProfile(median=0.015, p95=0.05)
+        self.key = key
+        self.items = {}
+        self._lock = threading.Lock()
+        self.calls = {"put_item": 0, "get_item": 0, "update_item": 0}
+
+    def _enter(self, op):
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+        fault = self.latency.roll()
+        self.latency.wait()
+        if fault:
+            raise _aws_error(fault, op)
+
+    def load(self):
+        self._enter("describe_table")
+
+    def put_item(self, Item, **kwargs):
+        self._enter("put_item")
+        _check_no_floats(Item)
+        with self._lock:
+            self.items[Item[self.key]] = deepcopy(Item)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        self._enter("get_item")
+        with self._lock:
+            item = self.items.get(Key[self.key])
+            return {"Item": deepcopy(item)} if item is not None else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues,
+                    ExpressionAttributeNames=None, **kwargs):
+        self._enter("update_item")
+        _check_no_floats(ExpressionAttributeValues)
+        names = ExpressionAttributeNames or {}
+
+        if not UpdateExpression.startswith("SET "):
+            raise ValueError(f"fake table only supports SET updates: {UpdateExpression}")
+
+        # "a = :v" and "a = if_not_exists(a, :v)" clauses
+        clauses = re.findall(r"([#\w]+)\s*=\s*(if_not_exists\(\s*[#\w]+\s*,\s*)?(:\w+)\)?",
+                             UpdateExpression[4:])
+        with self._lock:
+            item = self.items.setdefault(Key[self.key], dict(Key))
+            for attr, if_not_exists, placeholder in clauses:
+                attr = names.get(attr, attr)
+                if if_not_exists and attr in item:
+                    continue
+                item[attr] = deepcopy(ExpressionAttributeValues[placeholder])
+        return {}
+
+
+FAKE_FACTORIES = {
+    "bedrock": FakeBedrockRuntime,
+    "groq": FakeGroq,
+    "dynamodb": FakeDynamoTable,
+}
+
+__all__ = [
+    "LatencyProfile",
+    "FakeBedrockRuntime",
+    "FakeGroq",
+    "FakeDynamoTable",
+    "fake_client",
+    "install_fakes",
+    "fake_traits",
+]
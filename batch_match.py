@@ -0,0 +1,227 @@
+# batch_match.py
+#
+# Match a whole file of student transcripts against the career catalog.
+#
+#   python batch_match.py transcripts.jsonl results.parquet
+#   python batch_match.py transcripts.jsonl results.parquet --workers 32 --nova-rps 20 --titan-rps 50
+#
+# Input: one JSON object per line, either
+#   {"student_id": "...", "chat_history": [{"role": "user", "content": "..."}, ...]}
+#   {"student_id": "...", "transcript": "everything the student said"}
+# ("id" and "messages" / "text" are accepted too; missing ids use the line number.)
+#
+# Each student goes through the same steps as the results page (Nova traits,
+# Titan text + trait embeddings, fused match), with model calls spread over
+# --workers threads and paced per model by --nova-rps / --titan-rps only:
+# batch calls skip hedging and the app's interactive admission quota. Finished students are scored in
+# blocks with one matrix-matrix product and appended to the Parquet file as
+# one row group per block, so memory stays flat however long the input is.
+# Students whose calls fail are written with an `error` and no matches.
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bulk_embed import RateLimiter, with_retries
+from hedging import batch_calls
+from match_student_to_careers import (
+    build_embedding_payload,
+    build_report,
+    extract_traits,
+    fuse_embeddings,
+    get_career_catalog,
+    get_embedding,
+    infer_persona,
+)
+from results_pipeline import student_text, traits_chat
+from tracing import set_session
+
+
+# ============================================================
+#  INPUT
+# ============================================================
+
+def read_transcripts(path, limit=None):
+    """Yield (student_id, user_text) lazily, one line at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        n = 0
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+
+            student_id = str(rec.get("student_id") or rec.get("id") or line_no)
+            chat = rec.get("chat_history") or rec.get("messages")
+            if chat is not None:
+                text = student_text(chat)
+            else:
+                text = rec.get("transcript") or rec.get("text") or ""
+
+            yield student_id, text
+            n += 1
+            if limit and n >= limit:
+                return
+
+
+# ============================================================
+#  PER-STUDENT PROFILE (runs on the worker pool)
+# ============================================================
+
+def profile_student(student_id, user_text, extract, embed, trait_weight):
+    set_session(f"batch-{student_id}")
+    if not user_text.strip():
+        return {"student_id": student_id, "error": "empty transcript"}
+
+    try:
+        with batch_calls():
+            traits = extract(traits_chat(user_text))
+            text_emb = embed(user_text)
+            trait_emb = embed(build_embedding_payload(traits))
+    except Exception as e:
+        return {"student_id": student_id, "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "student_id": student_id,
+        "traits": traits,
+        "persona": infer_persona(traits, user_text),
+        "embedding": fuse_embeddings(text_emb, trait_emb, trait_weight),
+    }
+
+
+# ============================================================
+#  SCORING + OUTPUT
+# ============================================================
+
+SCHEMA_FIELDS = (
+    ("student_id", "string"),
+    ("persona", "string"),
+    ("traits", "string"),          # JSON
+    ("top_titles", "list<string>"),
+    ("top_scores", "list<double>"),
+    ("report", "string"),
+    ("error", "string"),
+)
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "list<string>": pa.list_(pa.string()),
+        "list<double>": pa.list_(pa.float64()),
+    }
+    return pa.schema([(name, types[t]) for name, t in SCHEMA_FIELDS])
+
+
+def score_block(profiles, catalog, top_k):
+    """Rows for a block of profiled students; matching is one batched product."""
+    ok = [p for p in profiles if "embedding" in p]
+    matches = catalog.match_many(np.stack([p["embedding"] for p in ok]), top_k=top_k) if ok else []
+    by_id = {id(p): m for p, m in zip(ok, matches)}
+
+    rows = []
+    for p in profiles:
+        m = by_id.get(id(p))
+        row = {
+            "student_id": p["student_id"],
+            "persona": p["persona"]["name"] if "persona" in p else None,
+            "traits": json.dumps(p["traits"]) if "traits" in p else None,
+            "top_titles": [t for t, _ in m] if m else None,
+            "top_scores": [s for _, s in m] if m else None,
+            "report": None,
+            "error": p.get("error"),
+        }
+        if m:
+            try:
+                row["report"] = build_report(p["traits"], m)
+            except (KeyError, IndexError, TypeError) as e:
+                row["error"] = f"report: {type(e).__name__}: {e}"
+        rows.append(row)
+    return rows
+
+
+def run_batch(in_path, out_path, catalog=None, workers=16, block_size=256, top_k=5,
+              trait_weight=0.5, nova_rps=0, titan_rps=0, limit=None):
+    """Stream transcripts → Parquet. Returns (students written, students failed)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    catalog = catalog or get_career_catalog()
+    extract = with_retries(extract_traits, RateLimiter(nova_rps))
+    embed = with_retries(get_embedding, RateLimiter(titan_rps))
+    schema = parquet_schema()
+
+    written = failed = 0
+    start = time.monotonic()
+    in_flight = deque()
+    done = []
+
+    def flush(writer):
+        nonlocal written, failed
+        rows = score_block(done, catalog, top_k)
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        written += len(rows)
+        failed += sum(1 for r in rows if r["error"])
+        done.clear()
+        rate = written / max(time.monotonic() - start, 1e-9)
+        print(f"  {written} students written ({failed} failed, {rate:.1f}/s)")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, \
+            pq.ParquetWriter(out_path, schema) as writer:
+        for student_id, text in read_transcripts(in_path, limit):
+            in_flight.append(pool.submit(
+                profile_student, student_id, text, extract, embed, trait_weight
+            ))
+            # bounded read-ahead; results leave in input order
+            while len(in_flight) >= 2 * block_size:
+                done.append(in_flight.popleft().result())
+                if len(done) >= block_size:
+                    flush(writer)
+
+        while in_flight:
+            done.append(in_flight.popleft().result())
+            if len(done) >= block_size:
+                flush(writer)
+        if done:
+            flush(writer)
+
+    return written, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-match student transcripts to careers.")
+    parser.add_argument("transcripts", help="input JSONL, one student per line")
+    parser.add_argument("out", help="output .parquet file")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent students in flight")
+    parser.add_argument("--block-size", type=int, default=256,
+                        help="students scored / written per Parquet row group")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--trait-weight", type=float, default=0.5)
+    parser.add_argument("--nova-rps", type=float, default=0, help="Nova calls/s cap (0 = none)")
+    parser.add_argument("--titan-rps", type=float, default=0, help="Titan calls/s cap (0 = none)")
+    parser.add_argument("--limit", type=int, help="only the first N students")
+    args = parser.parse_args()
+
+    catalog = get_career_catalog()
+    print(f"Matching against {len(catalog)} careers with {args.workers} workers…")
+
+    written, failed = run_batch(
+        args.transcripts, args.out, catalog,
+        workers=args.workers,
+        block_size=args.block_size,
+        top_k=args.top_k,
+        trait_weight=args.trait_weight,
+        nova_rps=args.nova_rps,
+        titan_rps=args.titan_rps,
+        limit=args.limit,
+    )
+    print(f"\n✔ Wrote {written} students to {args.out} ({failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# benchmarks.py
+#
+# Micro-benchmarks for the matching hot paths on synthetic catalogs.
+#
+#   python benchmarks.py                              # default grid
+#   python benchmarks.py --sizes 28,1000 --dims 1024  # subset
+#   python benchmarks.py --save bench_baseline.json   # record a baseline
+#   python benchmarks.py --compare bench_baseline.json --tolerance 0.25
+#   python benchmarks.py --dtypes float32,int8        # compact store formats
+#
+# Benchmarks (per catalog size × embedding dimension):
+#   load_json       json.load of a career_embeddings.json-style file
+#   load_store      open the .npy/.meta.json store (memory-mapped) + first match
+#   build_matcher   normalized matrix from the legacy dict
+#   cosine          the pairwise cosine() helper
+#   match_top5      match_careers(..., top_k=5) on a built matcher
+#   match_full      match_careers(...) full ranking
+#   (load_store / match_* are repeated per --dtypes entry; non-float32
+#   results are keyed e.g. "match_top5[int8]")
+#   payload         build_embedding_payload()
+#   report          build_report()
+#
+# Combinations whose data would exceed --max-bytes (or --json-max-careers
+# for the JSON file) are recorded as skipped rather than run.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DEFAULT_SIZES = "28,1000,10000,100000,1000000"
+DEFAULT_DIMS = "256,512,1024"
+
+SAMPLE_TRAITS = {
+    "transferable_skills": {"communication": 7, "creativity": 9, "organization": 4,
+                            "leadership": 5, "visual_design": 8, "problem_solving": 6,
+                            "digital_fluency": 8, "collaboration": 7, "initiative": 6,
+                            "customer_service": 3, "time_management": 5},
+    "interests": {"video": 9, "music": 6, "writing": 3, "performance": 4,
+                  "design": 7, "technology": 6, "entrepreneurship": 2},
+    "passion_signals": ["editing", "tiktok", "film", "beats"],
+    "work_experience_summary": "Edits short videos for friends and a local shop.",
+    "vibe_summary": "Visual storyteller who lives on the timeline.",
+}
+SAMPLE_TEXT = " ".join(["I edit TikToks and make beats in my room."] * 8)
+
+
+# ============================================================
+#  TIMING
+# ============================================================
+
+def measure(fn, min_time=0.2, max_repeats=1000, min_repeats=3):
+    """Run fn repeatedly; seconds per call as min / median / repeats."""
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < min_repeats or (time.perf_counter() < deadline and len(times) < max_repeats):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return {"min": min(times), "median": statistics.median(times), "repeats": len(times)}
+
+
+def synthetic_catalog(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((n, dim), dtype=np.float32)
+    titles = [f"Career {i}" for i in range(n)]
+    return titles, matrix
+
+
+# ============================================================
+#  BENCHMARKS
+# ============================================================
+
+def bench_size(n, dim, args, tmpdir):
+    from career_matcher import CareerMatcher
+    from career_store import CareerStore, load_store, save_store
+    from match_student_to_careers import (
+        build_embedding_payload,
+        build_report,
+        cosine,
+        match_careers,
+    )
+
+    results = {}
+
+    def run(name, fn, **kw):
+        key = f"{name}|n={n}|d={dim}"
+        results[key] = measure(fn, min_time=args.min_time, **kw)
+        r = results[key]
+        print(f"  {key:<32} median {r['median'] * 1e3:10.3f} ms  (min {r['min'] * 1e3:.3f}, x{r['repeats']})")
+
+    def skip(name, why):
+        key = f"{name}|n={n}|d={dim}"
+        results[key] = {"skipped": why}
+        print(f"  {key:<32} skipped: {why}")
+
+    matrix_bytes = n * dim * 4
+    if matrix_bytes > args.max_bytes:
+        for name in ("load_json", "load_store", "build_matcher", "match_top5", "match_full"):
+            skip(name, f"matrix is {matrix_bytes / 1e9:.1f} GB > --max-bytes")
+        return results
+
+    titles, matrix = synthetic_catalog(n, dim)
+    query = np.random.default_rng(1).standard_normal(dim).astype(np.float32)
+
+    # ---- legacy JSON ------------------------------------------------------
+    legacy = None
+    if n <= args.json_max_careers:
+        legacy = {
+            t: {"description": "desc", "category": "cat", "embedding": row.tolist()}
+            for t, row in zip(titles, matrix)
+        }
+        path = os.path.join(tmpdir, f"emb_{n}_{dim}.json")
+        with open(path, "w") as f:
+            json.dump(legacy, f)
+
+        def load_json():
+            with open(path) as f:
+                json.load(f)
+
+        run("load_json", load_json, max_repeats=20)
+        run("build_matcher", lambda: CareerMatcher.from_embeddings(legacy), max_repeats=20)
+    else:
+        skip("load_json", "over --json-max-careers")
+        skip("build_matcher", "over --json-max-careers")
+
+    careers = [{"name": t, "category": "cat", "description": "desc", "hash": ""} for t in titles]
+    for dtype in args.dtypes:
+        tag = "" if dtype == "float32" else f"[{dtype}]"
+
+        # ---- binary store -------------------------------------------------
+        prefix = os.path.join(tmpdir, f"store_{n}_{dim}_{dtype}")
+        save_store(CareerStore(careers, matrix), prefix, dtype=dtype)
+
+        def load_and_match():
+            load_store(prefix).matcher().match(query, top_k=5)
+
+        run("load_store" + tag, load_and_match, max_repeats=50)
+
+        # ---- matching -----------------------------------------------------
+        matcher = load_store(prefix, mmap=False).matcher()
+        run("match_top5" + tag, lambda: match_careers(query, matcher, top_k=5))
+        run("match_full" + tag, lambda: match_careers(query, matcher), max_repeats=50)
+
+    if n == min(args.sizes):
+        # size-independent helpers, once per dimension
+        a, b = matrix[0], matrix[-1]
+        run("cosine", lambda: cosine(a, b))
+        run("payload", lambda: build_embedding_payload(SAMPLE_TRAITS, SAMPLE_TEXT))
+        top = match_careers(query, matcher, top_k=5)
+        run("report", lambda: build_report(SAMPLE_TRAITS, top))
+
+    return results
+
+
+# ============================================================
+#  BASELINES
+# ============================================================
+
+def compare(current, baseline, tolerance, min_delta=50e-6):
+    """Print per-benchmark ratios; return the keys that regressed.
+
+    Slowdowns smaller than `min_delta` seconds are treated as timer noise.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<34}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for key, now in sorted(current.items()):
+        old = baseline.get(key)
+        if not old or "median" not in old or "median" not in now:
+            continue
+        ratio = now["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance and now["median"] - old["median"] > min_delta:
+            flag = "  ✗ slower"
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            flag = "  ✔ faster"
+        print(f"{key:<34}{old['median'] * 1e3:>10.3f}ms{now['median'] * 1e3:>10.3f}ms{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matching / loading / report micro-benchmarks.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--dims", default=DEFAULT_DIMS)
+    parser.add_argument("--dtypes", default="float32",
+                        help="store formats to benchmark (float32,float16,int8)")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds spent per benchmark (at least 3 runs)")
+    parser.add_argument("--max-bytes", type=float, default=2e9,
+                        help="skip catalogs whose float32 matrix is larger")
+    parser.add_argument("--json-max-careers", type=int, default=10_000,
+                        help="largest catalog written as legacy JSON")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown ratio before flagging a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this (timer noise)")
+    args = parser.parse_args()
+
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    dims = [int(d) for d in args.dims.split(",")]
+    args.dtypes = args.dtypes.split(",")
+    random.seed(0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for dim in dims:
+            for n in args.sizes:
+                print(f"\n▶ {n} careers × {dim} dims")
+                results.update(bench_size(n, dim, args, tmpdir))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✔ Wrote {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms / 1e3)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) over {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✔ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,49 @@
+import argparse
 import json
-import boto3
 
-bedrock = boto3.client("bedrock-runtime", region_name="us-east-1")
+import numpy as np
 
-def embed(text):
-    body = json.dumps({"inputText": text})
-    resp = bedrock.invoke_model(
-        modelId="amazon.titan-embed-text-v2:0",
+from aws_clients import get_client
+from backends import fake_client
+from bulk_embed import clear_checkpoint, embed_many, load_checkpoint
+from career_index import (
+    DEFAULT_EF_SEARCH,
+    DEFAULT_NPROBE,
+    INDEX_KINDS,
+    build_index,
+    index_kind,
+    index_matches,
+    recall_at_k,
+    remove_index,
+    save_index,
+    set_search_params,
+)
+from career_matcher import STORE_DTYPES, CareerMatcher, top_k_agreement
+from career_store import (
+    EMBED_DIM,
+    EMBED_MODEL_ID,
+    CareerStore,
+    career_text,
+    content_hash,
+    export_json,
+    load_store,
+    save_store,
+    store_exists,
+    store_paths,
+)
+from embedding_cache import EmbeddingCache
+
+DEFAULT_WORKERS = 8
+CHECKPOINT_PATH = "career_embeddings.checkpoint.jsonl"
+
+# the process-wide pooled client; SPARK_AWS_MAX_POOL should cover --workers
+bedrock = fake_client("bedrock") or get_client("bedrock-runtime", "us-east-1")
+
+def embed(text, client=None, dim=EMBED_DIM):
+    client = client or bedrock
+    body = json.dumps({"inputText": text, "dimensions": dim})
+    resp = client.invoke_model(
+        modelId=EMBED_MODEL_ID,
         contentType="application/json",
         accept="application/json",
         body=body
@@ -15,41 +52,196 @@ def embed(text):
     return out["embedding"]
 
 
-# -----------------------------------
-# LOAD YOUR JSON (dict → list)
-# -----------------------------------
-with open("careers_midsize.json", "r") as f:
-    data = json.load(f)
+PRECISION = {"int8": 0, "float16": 1, "float32": 2}
+
+
+def agreement_queries(matrix, n=200, noise=0.5, seed=0):
+    """Perturbed catalog rows — realistic queries with close runners-up."""
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(matrix, dtype=np.float32)[rng.integers(0, len(matrix), n)]
+    return rows + noise * rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(rows.shape[1])
+
+
+def item_hash(item):
+    text = career_text(item["name"], item.get("description", ""), item.get("category", ""))
+    return content_hash(text, EMBED_MODEL_ID)
+
+
+def plan_build(careers_list, previous):
+    """Line up the catalog against vectors from the last build.
+
+    previous maps content hash → embedding row. Returns the career metadata,
+    a row list with reused vectors filled in (None where missing) and the
+    [(row, text)] that still have to be sent to Titan.
+    """
+    careers = []
+    rows = []
+    todo = []
+
+    for item in careers_list:
+        title = item["name"]
+        category = item.get("category", "")
+        desc = item.get("description", "")
+
+        full_text = career_text(title, desc, category)
+        h = content_hash(full_text, EMBED_MODEL_ID)
+
+        careers.append({
+            "name": title,
+            "category": category,
+            "description": desc,
+            "hash": h,
+        })
 
-careers_list = data["careers"]   # this is the list you showed me
+        if h in previous:
+            rows.append(previous[h])
+        else:
+            rows.append(None)
+            todo.append((len(rows) - 1, full_text))
 
-output = {}
+    return careers, rows, todo
 
-# -----------------------------------
-# BUILD EMBEDDINGS FOR EACH CAREER
-# -----------------------------------
-for item in careers_list:
-    title = item["name"]
-    category = item.get("category", "")
-    desc = item.get("description", "")
 
-    full_text = f"{title}. {desc}. Category: {category}"
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the career embedding store.")
+    parser.add_argument("--careers", default="careers_midsize.json")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the existing store and re-embed every career")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="concurrent Titan calls")
+    parser.add_argument("--rps", type=float, default=0,
+                        help="max Titan requests per second (0 = no limit)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help="progress file an interrupted run resumes from")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the shared on-disk embedding cache")
+    parser.add_argument("--export-json", action="store_true",
+                        help="also write the legacy career_embeddings.json")
+    parser.add_argument("--index", choices=INDEX_KINDS + ("none",), default="auto",
+                        help="FAISS index to build next to the embeddings")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF list count")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="IVF lists probed during the recall check")
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH,
+                        help="HNSW efSearch during the recall check")
+    parser.add_argument("--recall-k", type=int, default=10,
+                        help="k for the recall check against exact search")
+    parser.add_argument("--dim", type=int, choices=(256, 512, 1024), default=EMBED_DIM,
+                        help="Titan v2 output dimension (serve with SPARK_EMBED_DIM to match)")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default="float32",
+                        help="on-disk / in-memory row format")
+    args = parser.parse_args()
+    if args.dtype != "float32" and args.index not in ("auto", "none"):
+        parser.error("FAISS indexes hold float32 rows — use --index auto/none with a compact --dtype")
+
+    # -----------------------------------
+    # LOAD YOUR JSON (dict → list)
+    # -----------------------------------
+    with open(args.careers, "r") as f:
+        data = json.load(f)
+
+    careers_list = data["careers"]   # this is the list you showed me
+
+    # -----------------------------------
+    # REUSE VECTORS FROM THE LAST BUILD
+    # -----------------------------------
+    previous = {}
+    previous_order = []
+    old_format = None
+    if store_exists() and not args.full:
+        old = load_store()
+        old_format = (old.dim, old.dtype)
+        # vectors are only reusable at the same dimension and at least the
+        # requested precision (int8 rows can't be turned back into float32)
+        if old.dim == args.dim and PRECISION[old.dtype] >= PRECISION[args.dtype]:
+            previous_order = [c.get("hash") for c in old.careers]
+            matrix = old.float32_matrix()
+            previous = {h: matrix[i] for i, h in enumerate(previous_order)}
+
+    dropped = len(set(previous) - {item_hash(item) for item in careers_list})
+
+    resumed = {h: e for h, e in load_checkpoint(args.checkpoint).items() if len(e) == args.dim}
+    if resumed:
+        print(f"Resuming: {len(resumed)} embeddings found in {args.checkpoint}")
+        previous.update(resumed)
+
+    careers, rows, todo = plan_build(careers_list, previous)
+
+    print(f"{len(careers) - len(todo)} unchanged, {len(todo)} to embed, {dropped} stale vectors dropped")
+
+    # -----------------------------------
+    # EMBED NEW OR EDITED CAREERS
+    # -----------------------------------
+    if not args.no_cache:
+        cache = EmbeddingCache(path=None) if fake_client("bedrock") else EmbeddingCache()
+
+        def embed_fn(text):
+            return cache.get_or_compute(
+                EMBED_MODEL_ID, args.dim, text, lambda t: embed(t, dim=args.dim)
+            ).tolist()
+    else:
+        def embed_fn(text):
+            return embed(text, dim=args.dim)
+
+    if todo:
+        done = embed_many(
+            [(careers[i]["hash"], text) for i, text in todo],
+            embed_fn,
+            workers=args.workers,
+            rps=args.rps,
+            checkpoint=args.checkpoint,
+        )
+        for i, _ in todo:
+            rows[i] = done[careers[i]["hash"]]
+
+    # -----------------------------------
+    # SAVE NEW EMBEDDINGS
+    # -----------------------------------
+    changed = (
+        [c["hash"] for c in careers] != previous_order
+        or old_format != (args.dim, args.dtype)
+    )
+    store = CareerStore(careers, np.array(rows, dtype=np.float32), model_id=EMBED_MODEL_ID)
+    if changed:
+        save_store(store, dtype=args.dtype)
+    clear_checkpoint(args.checkpoint)
+
+    if changed and args.dtype != "float32":
+        agreement = top_k_agreement(
+            CareerMatcher(store.titles, store.matrix),
+            load_store().matcher(),
+            agreement_queries(store.matrix),
+            k=args.recall_k,
+        )
+        print(f"{args.dtype} rows: top-{args.recall_k} agreement with float32 = {agreement:.3f}")
 
-    print(f"Embedding → {title}")
-    emb = embed(full_text)
+    if args.export_json:
+        export_json(store)
 
-    output[title] = {
-        "description": desc,
-        "category": category,
-        "embedding": emb
-    }
+    # -----------------------------------
+    # BUILD ANN INDEX
+    # -----------------------------------
+    # compact stores are served by CompactCareerMatcher — an index would
+    # bring back the float32 copy they exist to avoid
+    if args.index == "none" or args.dtype != "float32":
+        remove_index()   # would no longer match the store
+    elif changed or not index_matches(store):
+        index = build_index(store.matrix, kind=args.index, nlist=args.nlist)
+        save_index(index, store)
 
-# -----------------------------------
-# SAVE NEW EMBEDDINGS
-# -----------------------------------
-with open("career_embeddings.json", "w") as f:
-    json.dump(output, f, indent=2)
+        kind = index_kind(index)
+        if kind != "flat":
+            set_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+            recall = recall_at_k(index, store.matrix, k=args.recall_k)
+            print(f"Index: {kind}, recall@{args.recall_k} vs exact = {recall:.3f}")
+        else:
+            print("Index: flat (exact)")
 
-print("\n✔ DONE — Titan v2 embeddings (1024-dim) rebuilt successfully!")
+    if changed:
+        print(f"\n✔ DONE — Titan v2 embeddings ({store.dim}-dim, {args.dtype}) rebuilt → {store_paths()[0]}")
+    else:
+        print("\n✔ Nothing changed — store is up to date.")
 
 
+if __name__ == "__main__":
+    main()
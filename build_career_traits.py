@@ -0,0 +1,138 @@
+# build_career_traits.py
+#
+# Rate every career in careers_midsize.json on the 18 trait dimensions
+# (11 transferable skills + 7 interests) with Nova, once, and write
+# career_traits.json for the trait-vector matching path.
+#
+#   python build_career_traits.py                 # only new / edited careers
+#   python build_career_traits.py --full --workers 16 --rps 10
+import argparse
+import json
+
+import numpy as np
+
+from bulk_embed import clear_checkpoint, embed_many, load_checkpoint
+from career_store import career_text, content_hash
+from career_traits import (
+    TRAITS_PATH,
+    load_trait_profiles,
+    save_trait_profiles,
+    trait_profiles_exist,
+    trait_vector,
+)
+from match_student_to_careers import TRAIT_MODEL_ID, get_bedrock
+
+CHECKPOINT_PATH = "career_traits.checkpoint.jsonl"
+FAILED_PATH = "career_traits.failed.jsonl"
+
+CAREER_TRAIT_PROMPT = """
+You rate entertainment-industry careers for a career-matching tool.
+Score how much the career below relies on each transferable skill and how
+strongly it relates to each interest, from 0 (not at all) to 10 (core).
+Return ONLY JSON with the two objects "transferable_skills" and "interests"
+using exactly these keys:
+"""
+
+
+def rating_prompt():
+    from match_student_to_careers import INTEREST_NAMES, SKILL_NAMES
+
+    return CAREER_TRAIT_PROMPT + json.dumps({
+        "transferable_skills": {k: 0 for k in SKILL_NAMES},
+        "interests": {k: 0 for k in INTEREST_NAMES},
+    }, indent=2)
+
+
+def item_hash(item):
+    # the prompt is part of the hash: editing it re-rates every career
+    text = career_text(item["name"], item.get("description", ""), item.get("category", ""))
+    return content_hash(CAREER_TRAIT_PROMPT + text, TRAIT_MODEL_ID)
+
+
+def rate_career(text, attempts=2):
+    """One Nova call → 18 trait scores for the career described by `text`."""
+    for attempt in range(attempts):
+        response = get_bedrock().converse(
+            modelId=TRAIT_MODEL_ID,
+            system=[{"text": rating_prompt()}],
+            messages=[{"role": "user", "content": [{"text": f"Career: {text}"}]}],
+        )
+        out = response["output"]["message"]["content"][0]["text"]
+        try:
+            return trait_vector(json.loads(out)).tolist()
+        except (ValueError, AttributeError):
+            if attempt == attempts - 1:
+                raise ValueError(f"Nova returned invalid JSON for {text[:60]!r}: {out[:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate every career on the 18 trait dimensions.")
+    parser.add_argument("--careers", default="careers_midsize.json")
+    parser.add_argument("--out", default=TRAITS_PATH)
+    parser.add_argument("--full", action="store_true", help="re-rate every career")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent Nova calls")
+    parser.add_argument("--rps", type=float, default=0, help="max Nova requests per second")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--failed", default=FAILED_PATH,
+                        help="careers Nova could not rate (retried on the next run)")
+    args = parser.parse_args()
+
+    with open(args.careers, "r") as f:
+        careers_list = json.load(f)["careers"]
+
+    previous = {}
+    if trait_profiles_exist(args.out) and not args.full:
+        old_careers, old_profiles = load_trait_profiles(args.out)
+        previous = {c["hash"]: old_profiles[i] for i, c in enumerate(old_careers)}
+
+    resumed = load_checkpoint(args.checkpoint)
+    if resumed:
+        print(f"Resuming: {len(resumed)} profiles found in {args.checkpoint}")
+        previous.update(resumed)
+
+    careers = []
+    todo = []
+    for item in careers_list:
+        h = item_hash(item)
+        careers.append({
+            "name": item["name"],
+            "category": item.get("category", ""),
+            "description": item.get("description", ""),
+            "hash": h,
+        })
+        if h not in previous:
+            todo.append((h, career_text(item["name"], item.get("description", ""), item.get("category", ""))))
+
+    print(f"{len(careers) - len(todo)} unchanged, {len(todo)} to rate")
+
+    # one unparseable rating must not cost the whole run: record it, leave
+    # the career out (it ranks on embeddings alone) and retry it next time
+    names = {c["hash"]: c["name"] for c in careers}
+    failed = []
+
+    def record_failure(h, error):
+        failed.append({"name": names[h], "hash": h, "error": str(error)})
+        print(f"  ✘ {names[h]}: {error}")
+
+    if todo:
+        previous.update(embed_many(
+            todo, rate_career, workers=args.workers, rps=args.rps, checkpoint=args.checkpoint,
+            on_error=record_failure
+        ))
+
+    rated = [c for c in careers if c["hash"] in previous]
+    profiles = np.array([previous[c["hash"]] for c in rated], dtype=np.float32)
+    save_trait_profiles(rated, profiles, TRAIT_MODEL_ID, path=args.out)
+    clear_checkpoint(args.checkpoint)
+
+    if failed:
+        with open(args.failed, "w", encoding="utf-8") as f:
+            for row in failed:
+                f.write(json.dumps(row) + "\n")
+        print(f"\n{len(failed)} careers could not be rated — see {args.failed}")
+
+    print(f"\n✔ DONE — {len(rated)} career trait profiles → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
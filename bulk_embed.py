@@ -0,0 +1,152 @@
+# bulk_embed.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+
+# ============================================================
+#  THROTTLING / RETRY POLICY
+# ============================================================
+
+RETRYABLE_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+
+
+def is_retryable(exc):
+    if isinstance(exc, ClientError):
+        err = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        return err.get("Code") in RETRYABLE_CODES or status in (429, 500, 503)
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class RateLimiter:
+    """Spaces calls at most `rate` per second across all threads (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def with_retries(fn, limiter=None, attempts=8, max_wait=30.0):
+    """Wrap fn with rate limiting and jittered exponential backoff on throttling."""
+    limiter = limiter or RateLimiter(0)
+
+    @retry(
+        retry=retry_if_exception(is_retryable),
+        wait=wait_random_exponential(multiplier=0.5, max=max_wait),
+        stop=stop_after_attempt(attempts),
+        reraise=True,
+    )
+    def call(*args, **kwargs):
+        limiter.acquire()
+        return fn(*args, **kwargs)
+
+    return call
+
+
+# ============================================================
+#  CHECKPOINT
+# ============================================================
+# One JSON line per finished embedding: {"hash": ..., "embedding": [...]}.
+# An interrupted run picks up everything already written here.
+
+def load_checkpoint(path):
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # torn last line from a crash
+            done[rec["hash"]] = rec["embedding"]
+    return done
+
+
+def clear_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+# ============================================================
+#  BULK EMBEDDING
+# ============================================================
+
+def embed_many(items, embed_fn, workers=8, rps=0, checkpoint=None, progress_every=100,
+               on_error=None):
+    """Embed [(key, text)] concurrently; returns {key: embedding}.
+
+    embed_fn(text) does one model call — pass a stubbed client in tests.
+    Finished results are appended to `checkpoint` as they arrive.
+    on_error(key, exc), if given, records a failed item and the run goes
+    on without it; otherwise the first failure aborts the run.
+    """
+    call = with_retries(embed_fn, RateLimiter(rps))
+    results = {}
+    lock = threading.Lock()
+    out = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    start = time.monotonic()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(call, text): key for key, text in items}
+            try:
+                for fut in as_completed(futures):
+                    key = futures[fut]
+                    try:
+                        emb = fut.result()
+                    except Exception as e:
+                        if on_error is None:
+                            raise
+                        on_error(key, e)
+                        continue
+
+                    with lock:
+                        results[key] = emb
+                        if out:
+                            out.write(json.dumps({"hash": key, "embedding": emb}) + "\n")
+                            out.flush()
+
+                    n = len(results)
+                    if progress_every and (n % progress_every == 0 or n == len(futures)):
+                        rate = n / max(time.monotonic() - start, 1e-9)
+                        print(f"  embedded {n}/{len(futures)} ({rate:.1f}/s)")
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+    finally:
+        if out:
+            out.close()
+
+    return results
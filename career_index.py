@@ -0,0 +1,202 @@
+# career_index.py
+import json
+import math
+import os
+
+import faiss
+import numpy as np
+
+from career_matcher import CareerMatcher, normalize_rows, top_k_indices
+from career_store import STORE_PREFIX
+
+
+# ============================================================
+#  INDEX KINDS
+# ============================================================
+# flat  exact inner product (rows are unit-norm → cosine)
+# ivf   inverted file, search cost ~ nprobe / nlist of the catalog
+# hnsw  graph index, search cost controlled by efSearch
+#
+# "auto" picks flat for small catalogs and IVF past FLAT_MAX_CAREERS.
+
+INDEX_KINDS = ("auto", "flat", "ivf", "hnsw")
+FLAT_MAX_CAREERS = 50_000
+
+# recall/latency knobs — raise for recall, lower for latency
+DEFAULT_NPROBE = int(os.getenv("SPARK_INDEX_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("SPARK_INDEX_EF_SEARCH", "64"))
+DEFAULT_HNSW_M = 32
+
+
+def index_path(prefix=STORE_PREFIX):
+    return prefix + ".faiss"
+
+
+def index_meta_path(prefix=STORE_PREFIX):
+    # fingerprint of the store the index was built from
+    return prefix + ".faiss.json"
+
+
+def index_exists(prefix=STORE_PREFIX):
+    return os.path.exists(index_path(prefix))
+
+
+def index_matches(store, prefix=STORE_PREFIX):
+    """True if the saved index was built from exactly this store (same rows, same order)."""
+    try:
+        with open(index_meta_path(prefix), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("fingerprint") == store.fingerprint()
+
+
+# ============================================================
+#  BUILD / SAVE / LOAD
+# ============================================================
+
+def build_index(matrix, kind="auto", nlist=None, hnsw_m=DEFAULT_HNSW_M):
+    matrix = np.ascontiguousarray(normalize_rows(matrix), dtype=np.float32)
+    n, dim = matrix.shape
+
+    if kind == "auto":
+        kind = "flat" if n <= FLAT_MAX_CAREERS else "ivf"
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+
+    elif kind == "ivf":
+        # ~4·sqrt(n) lists, but keep ≥ 39 training points per list
+        nlist = nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+
+    else:
+        raise ValueError(f"unknown index kind {kind!r} (expected one of {INDEX_KINDS})")
+
+    index.add(matrix)
+    set_search_params(index)
+    return index
+
+
+def set_search_params(index, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    """Apply the recall/latency trade-off to an IVF or HNSW index (no-op for flat)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def index_kind(index):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def save_index(index, store, prefix=STORE_PREFIX):
+    path = index_path(prefix)
+    tmp = path + ".tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
+
+    # written last: a crash in between leaves a fingerprint that won't match
+    meta_path = index_meta_path(prefix)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": store.fingerprint(), "kind": index_kind(index)}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def remove_index(prefix=STORE_PREFIX):
+    for path in (index_path(prefix), index_meta_path(prefix)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_index(prefix=STORE_PREFIX, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    index = faiss.read_index(index_path(prefix))
+    return set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+
+
+# ============================================================
+#  RECALL CHECK
+# ============================================================
+
+def recall_at_k(index, matrix, k=10, n_queries=200, queries=None, seed=0):
+    """Mean top-k overlap between the index and exact search.
+
+    By default the queries are a random sample of catalog rows, slightly
+    perturbed so they are not trivially their own nearest neighbour.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n = matrix.shape[0]
+    k = min(k, n)
+
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(n, size=min(n_queries, n), replace=False)
+        noise = rng.normal(scale=0.05 / math.sqrt(matrix.shape[1]), size=(len(picks), matrix.shape[1]))
+        queries = matrix[picks] + noise.astype(np.float32)
+    queries = np.ascontiguousarray(normalize_rows(queries), dtype=np.float32)
+
+    _, approx = index.search(queries, k)
+
+    hits = 0
+    for q, found in zip(queries, approx):
+        exact = top_k_indices(matrix @ q, k)
+        hits += len(set(exact.tolist()) & set(found.tolist()))
+
+    return hits / (len(queries) * k)
+
+
+# ============================================================
+#  INDEXED MATCHER
+# ============================================================
+
+class IndexedCareerMatcher(CareerMatcher):
+    """CareerMatcher whose top-k goes through a FAISS index."""
+
+    def __init__(self, titles, matrix, index, normalized=False):
+        super().__init__(titles, matrix, normalized=normalized)
+        if index.ntotal != len(self.titles):
+            raise ValueError(f"index has {index.ntotal} vectors but catalog has {len(self.titles)}")
+        self.index = index
+
+    def match(self, student_emb, top_k=None):
+        if top_k is None:
+            # full ranking is what the exact path is for
+            return super().match(student_emb)
+
+        q = normalize_rows(np.asarray(student_emb, dtype=np.float32).reshape(1, -1))
+        scores, ids = self.index.search(q, min(top_k, len(self.titles)))
+        return [
+            (self.titles[i], round(float(s), 4))
+            for s, i in zip(scores[0], ids[0])
+            if i >= 0
+        ]
+
+    def match_many(self, student_embs, top_k=None):
+        if top_k is None:
+            return super().match_many(student_embs)
+
+        q = normalize_rows(np.asarray(student_embs, dtype=np.float32))
+        scores, ids = self.index.search(q, min(top_k, len(self.titles)))
+        return [
+            [(self.titles[i], round(float(s), 4)) for s, i in zip(row_s, row_i) if i >= 0]
+            for row_s, row_i in zip(scores, ids)
+        ]
+
+
+def load_indexed_matcher(store, prefix=STORE_PREFIX):
+    if store.dtype != "float32":
+        raise ValueError(f"{store.dtype} stores are served without an index")
+    if not index_matches(store, prefix):
+        raise ValueError("index was built from a different store — rerun build_career_embeddings.py")
+    return IndexedCareerMatcher(store.titles, store.matrix, load_index(prefix), normalized=True)
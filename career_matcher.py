@@ -0,0 +1,204 @@
+# career_matcher.py
+import numpy as np
+
+
+# ============================================================
+#  VECTORIZED CAREER MATCHER
+# ============================================================
+# The whole catalog lives in one L2-normalized float32 matrix
+# (one row per career), built once. Scoring a student is a single
+# matrix-vector product; top-k uses argpartition so we never sort
+# the full catalog.
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores, k=None):
+    """Indices of the k highest scores, best first (all of them if k is None)."""
+    n = scores.shape[-1]
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def top_k_rows(scores, k=None):
+    """top_k_indices for every row of a (students × careers) score matrix."""
+    n = scores.shape[-1]
+    if k is None or k >= n:
+        return np.argsort(-scores, axis=1, kind="stable")
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+# students scored per matrix-matrix product (keeps the score block ~256 MB)
+MAX_SCORE_CELLS = 1 << 26
+
+
+class CareerMatcher:
+    def __init__(self, titles, matrix, normalized=False):
+        self.titles = list(titles)
+        if normalized:
+            # caller guarantees unit rows (e.g. a memory-mapped store) — no copy
+            self.matrix = np.asarray(matrix, dtype=np.float32)
+        else:
+            self.matrix = normalize_rows(matrix)
+
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.titles):
+            raise ValueError(
+                f"matrix shape {self.matrix.shape} does not match {len(self.titles)} titles"
+            )
+
+    @classmethod
+    def from_embeddings(cls, career_embeddings):
+        """Build from the {title: {"embedding": [...], ...}} dict in career_embeddings.json."""
+        titles = list(career_embeddings.keys())
+        matrix = np.array(
+            [career_embeddings[t]["embedding"] for t in titles],
+            dtype=np.float32
+        )
+        return cls(titles, matrix)
+
+    def __len__(self):
+        return len(self.titles)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def scores(self, student_emb):
+        """Cosine similarity of one student embedding against every career."""
+        q = normalize_rows(student_emb)
+        return self.matrix @ q
+
+    def match(self, student_emb, top_k=None):
+        """[(title, score), ...] best first — same contract as match_careers."""
+        scores = self.scores(student_emb)
+        return [
+            (self.titles[i], round(float(scores[i]), 4))
+            for i in top_k_indices(scores, top_k)
+        ]
+
+    def scores_many(self, student_embs):
+        """(students × careers) cosine matrix — one matrix-matrix product."""
+        return normalize_rows(student_embs) @ self.matrix.T
+
+    def match_many(self, student_embs, top_k=None):
+        """match() for a batch of students; one list of (title, score) per row."""
+        q = np.asarray(student_embs, dtype=np.float32)
+        step = max(1, MAX_SCORE_CELLS // max(len(self.titles), 1))
+        out = []
+        for start in range(0, len(q), step):
+            scores = self.scores_many(q[start:start + step])
+            idx = top_k_rows(scores, top_k)
+            top = np.take_along_axis(scores, idx, axis=1)
+            out.extend(
+                [(self.titles[i], round(float(v), 4)) for i, v in zip(row_idx, row_scores)]
+                for row_idx, row_scores in zip(idx, top)
+            )
+        return out
+
+
+# ============================================================
+#  COMPACT STORAGE (float16 / int8)
+# ============================================================
+# float16 halves the catalog; int8 with one float32 scale per row cuts it
+# ~4x (16x together with 256-dim Titan vectors). Scoring walks the compact
+# matrix in row blocks and widens one block at a time, so a float32 copy
+# of the whole catalog never exists.
+
+STORE_DTYPES = ("float32", "float16", "int8")
+# rows widened per step — sized so the float32 scratch block stays in cache
+SCORE_BLOCK_BYTES = 1 << 20
+
+
+def quantize_rows(matrix, dtype):
+    """Unit-norm float32 rows → (compact matrix, per-row scales or None)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.rint(matrix / scales[:, None]).astype(np.int8)
+        # fold the rounding error into the scale so dequantized rows stay unit-norm
+        norms = np.linalg.norm(q.astype(np.float32), axis=1) * scales
+        norms[norms == 0] = 1.0
+        return q, (scales / norms).astype(np.float32)
+    raise ValueError(f"unknown store dtype {dtype!r} (expected one of {STORE_DTYPES})")
+
+
+def dequantize_rows(matrix, scales=None):
+    out = np.asarray(matrix, dtype=np.float32)
+    if scales is not None:
+        out = out * np.asarray(scales, dtype=np.float32)[:, None]
+    return out
+
+
+class CompactCareerMatcher(CareerMatcher):
+    """CareerMatcher that scores float16 / int8 (+ scales) rows in place."""
+
+    def __init__(self, titles, matrix, scales=None):
+        self.titles = list(titles)
+        self.matrix = matrix
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.titles):
+            raise ValueError(
+                f"matrix shape {self.matrix.shape} does not match {len(self.titles)} titles"
+            )
+        if self.matrix.dtype == np.int8 and self.scales is None:
+            raise ValueError("int8 rows need per-row scales")
+
+    def _blocks(self):
+        """(start, float32 block) over the catalog, reusing one scratch buffer."""
+        n, dim = self.matrix.shape
+        rows = max(64, SCORE_BLOCK_BYTES // (4 * dim))
+        buf = np.empty((min(rows, n), dim), dtype=np.float32)
+        for start in range(0, n, rows):
+            block = self.matrix[start:start + rows]
+            out = buf[:len(block)]
+            np.copyto(out, block, casting="unsafe")
+            yield start, out
+
+    def scores(self, student_emb):
+        q = normalize_rows(student_emb)
+        out = np.empty(len(self.titles), dtype=np.float32)
+        for start, block in self._blocks():
+            np.dot(block, q, out=out[start:start + len(block)])
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def scores_many(self, student_embs):
+        q = normalize_rows(student_embs)
+        out = np.empty((len(q), len(self.titles)), dtype=np.float32)
+        for start, block in self._blocks():
+            out[:, start:start + len(block)] = q @ block.T
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+
+def top_k_agreement(reference, candidate, queries, k=10):
+    """Mean share of the reference matcher's top-k that the candidate also returns."""
+    ref = reference.match_many(queries, top_k=k)
+    got = candidate.match_many(queries, top_k=k)
+    overlap = [
+        len({t for t, _ in a} & {t for t, _ in b}) / max(len(a), 1)
+        for a, b in zip(ref, got)
+    ]
+    return float(np.mean(overlap)) if overlap else 1.0
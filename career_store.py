@@ -0,0 +1,235 @@
+# career_store.py
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from career_matcher import (
+    CareerMatcher,
+    CompactCareerMatcher,
+    dequantize_rows,
+    normalize_rows,
+    quantize_rows,
+)
+
+
+# ============================================================
+#  FILE LAYOUT
+# ============================================================
+# career_embeddings.npy        unit-norm matrix, one row per career
+#                              (float32, or float16 / int8 — see meta "dtype")
+# career_embeddings.scales.npy per-row float32 scales (int8 stores only)
+# career_embeddings.meta.json  titles / categories / descriptions,
+#                              model id, dimension, dtype, content hashes
+# career_embeddings.json       legacy format, kept for import/export
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STORE_PREFIX = os.path.join(BASE_DIR, "career_embeddings")
+LEGACY_JSON = os.path.join(BASE_DIR, "career_embeddings.json")
+
+EMBED_MODEL_ID = "amazon.titan-embed-text-v2:0"
+# Titan v2 returns 256, 512 or 1024 dims. Queries and the store must agree,
+# so rebuild the store (build_career_embeddings.py --dim) when changing this.
+EMBED_DIM = int(os.getenv("SPARK_EMBED_DIM", "1024"))
+STORE_FORMAT = 1
+
+
+def store_paths(prefix=STORE_PREFIX):
+    return prefix + ".npy", prefix + ".meta.json"
+
+
+def scales_path(prefix=STORE_PREFIX):
+    return prefix + ".scales.npy"
+
+
+# ============================================================
+#  CONTENT HASHING
+# ============================================================
+
+def career_text(name, description="", category=""):
+    """The exact text we send to Titan for a career."""
+    return f"{name}. {description}. Category: {category}"
+
+
+def content_hash(text, model_id=EMBED_MODEL_ID):
+    h = hashlib.sha256()
+    h.update(model_id.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+# ============================================================
+#  STORE
+# ============================================================
+
+class CareerStore:
+    def __init__(self, careers, matrix, model_id=EMBED_MODEL_ID, scales=None):
+        # careers: list of {"name", "category", "description", "hash"}
+        self.careers = list(careers)
+        self.matrix = matrix
+        self.model_id = model_id
+        self.scales = scales   # int8 stores only
+
+        if len(self.careers) != self.matrix.shape[0]:
+            raise ValueError(
+                f"{len(self.careers)} careers but {self.matrix.shape[0]} embedding rows"
+            )
+
+    def __len__(self):
+        return len(self.careers)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    @property
+    def dtype(self):
+        return str(self.matrix.dtype)
+
+    @property
+    def titles(self):
+        return [c["name"] for c in self.careers]
+
+    def fingerprint(self):
+        """Hash of the model, dimension and per-career content hashes, in row order."""
+        h = hashlib.sha256(f"{self.model_id}\0{self.dim}".encode("utf-8"))
+        for c in self.careers:
+            h.update(b"\0")
+            h.update(c.get("hash", c["name"]).encode("utf-8"))
+        return h.hexdigest()
+
+    def float32_matrix(self):
+        if self.dtype == "float32":
+            return self.matrix
+        return dequantize_rows(self.matrix, self.scales)
+
+    def matcher(self):
+        # rows are stored already normalized, so the matcher can use the
+        # memory-mapped array directly instead of copying it
+        if self.dtype == "float32":
+            return CareerMatcher(self.titles, self.matrix, normalized=True)
+        return CompactCareerMatcher(self.titles, self.matrix, self.scales)
+
+    def to_embeddings_dict(self):
+        """Legacy {title: {"description", "category", "embedding"}} dict."""
+        matrix = self.float32_matrix()
+        return {
+            c["name"]: {
+                "description": c.get("description", ""),
+                "category": c.get("category", ""),
+                "embedding": [float(x) for x in matrix[i]],
+            }
+            for i, c in enumerate(self.careers)
+        }
+
+
+def _atomic_write(path, write):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def save_store(store, prefix=STORE_PREFIX, dtype=None):
+    """Write the store as `dtype` (default: the store's own dtype)."""
+    npy_path, meta_path = store_paths(prefix)
+    dtype = dtype or store.dtype
+    matrix, scales = quantize_rows(normalize_rows(store.float32_matrix()), dtype)
+    matrix = np.ascontiguousarray(matrix)
+
+    meta = {
+        "format": STORE_FORMAT,
+        "model_id": store.model_id,
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "dtype": dtype,
+        "normalized": True,
+        "careers": store.careers,
+    }
+
+    _atomic_write(npy_path, lambda f: np.save(f, matrix))
+    if scales is not None:
+        _atomic_write(scales_path(prefix), lambda f: np.save(f, scales))
+    elif os.path.exists(scales_path(prefix)):
+        os.remove(scales_path(prefix))
+    _atomic_write(meta_path, lambda f: f.write(json.dumps(meta, indent=1).encode("utf-8")))
+
+
+def load_store(prefix=STORE_PREFIX, mmap=True):
+    npy_path, meta_path = store_paths(prefix)
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    if meta.get("format") != STORE_FORMAT:
+        raise ValueError(f"unsupported career store format: {meta.get('format')}")
+
+    mode = "r" if mmap else None
+    matrix = np.load(npy_path, mmap_mode=mode)
+    if matrix.ndim != 2 or matrix.shape[1] != meta["dim"]:
+        raise ValueError(f"{npy_path}: shape {matrix.shape} does not match dim {meta['dim']}")
+    if str(matrix.dtype) != meta.get("dtype", "float32"):
+        raise ValueError(f"{npy_path}: dtype {matrix.dtype} does not match meta {meta.get('dtype')}")
+
+    scales = None
+    if meta.get("dtype") == "int8":
+        scales = np.load(scales_path(prefix), mmap_mode=mode)
+        if scales.shape != (matrix.shape[0],):
+            raise ValueError(f"{scales_path(prefix)}: {scales.shape[0]} scales for {matrix.shape[0]} rows")
+
+    return CareerStore(meta["careers"], matrix, model_id=meta["model_id"], scales=scales)
+
+
+def store_exists(prefix=STORE_PREFIX):
+    return all(os.path.exists(p) for p in store_paths(prefix))
+
+
+# ============================================================
+#  LEGACY JSON IMPORT / EXPORT
+# ============================================================
+
+def import_json(path=LEGACY_JSON, model_id=EMBED_MODEL_ID):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    careers = []
+    rows = []
+    for name, item in data.items():
+        desc = item.get("description", "")
+        category = item.get("category", "")
+        careers.append({
+            "name": name,
+            "category": category,
+            "description": desc,
+            "hash": content_hash(career_text(name, desc, category), model_id),
+        })
+        rows.append(item["embedding"])
+
+    matrix = normalize_rows(np.array(rows, dtype=np.float32))
+    return CareerStore(careers, matrix, model_id=model_id)
+
+
+def export_json(store, path=LEGACY_JSON):
+    data = store.to_embeddings_dict()
+    _atomic_write(path, lambda f: f.write(json.dumps(data, indent=2).encode("utf-8")))
+
+
+def load_catalog(prefix=STORE_PREFIX, json_path=LEGACY_JSON):
+    """Binary store if present, otherwise fall back to the legacy JSON file."""
+    if store_exists(prefix):
+        return load_store(prefix)
+    return import_json(json_path)
+
+
+# ============================================================
+#  CLI: convert career_embeddings.json → binary store
+# ============================================================
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else LEGACY_JSON
+    store = import_json(src)
+    save_store(store)
+    print(f"✔ Wrote {len(store)} careers ({store.dim}-dim) to {STORE_PREFIX}.npy")
@@ -0,0 +1,161 @@
+# career_traits.py
+import json
+import os
+
+import numpy as np
+
+from career_matcher import CareerMatcher, top_k_indices
+from match_student_to_careers import INTEREST_NAMES, SKILL_NAMES
+
+# ============================================================
+#  CAREER TRAIT PROFILES
+# ============================================================
+# Every career rated on the same 0–10 scale extract_traits() uses for
+# students: 11 transferable skills followed by 7 interests. The matrix is
+# built once by build_career_traits.py and lives in career_traits.json.
+#
+# Similarity is the cosine of mean-centred vectors (Pearson correlation),
+# so what counts is the *shape* of the profile — which skills stand out —
+# not how generous the rater was overall.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAITS_PATH = os.path.join(BASE_DIR, "career_traits.json")
+TRAITS_FORMAT = 1
+
+TRAIT_NAMES = SKILL_NAMES + INTEREST_NAMES
+TRAIT_DIM = len(TRAIT_NAMES)          # 18
+
+
+def trait_vector(traits):
+    """Student (or career) trait dict → float32 vector in TRAIT_NAMES order."""
+    vec = np.zeros(TRAIT_DIM, dtype=np.float32)
+    if not traits:
+        return vec
+
+    i = 0
+    for group, names in (("transferable_skills", SKILL_NAMES), ("interests", INTEREST_NAMES)):
+        scores = traits.get(group) or {}
+        for name in names:
+            try:
+                vec[i] = min(max(float(scores.get(name, 0)), 0.0), 10.0)
+            except (TypeError, ValueError):
+                pass
+            i += 1
+    return vec
+
+
+def center_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix - matrix.mean(axis=-1, keepdims=True)
+
+
+class TraitMatcher(CareerMatcher):
+    """CareerMatcher over centred trait profiles; scores take raw trait vectors."""
+
+    def __init__(self, titles, profiles):
+        self.profiles = np.asarray(profiles, dtype=np.float32)
+        super().__init__(titles, center_rows(self.profiles))
+
+    def scores(self, student_vec):
+        return super().scores(center_rows(student_vec))
+
+    def scores_many(self, student_vecs):
+        return super().scores_many(center_rows(student_vecs))
+
+    def aligned(self, titles):
+        """Same profiles re-ordered to `titles`; careers without a profile get zeros."""
+        row = {t: i for i, t in enumerate(self.titles)}
+        profiles = np.zeros((len(titles), TRAIT_DIM), dtype=np.float32)
+        for j, t in enumerate(titles):
+            i = row.get(t)
+            if i is not None:
+                profiles[j] = self.profiles[i]
+        return TraitMatcher(titles, profiles)
+
+
+# ============================================================
+#  BLENDED RANKING
+# ============================================================
+
+def min_max(scores):
+    """Rescale to [0, 1] over the candidates (all zeros if they are all equal)."""
+    scores = np.nan_to_num(np.asarray(scores, dtype=np.float32))
+    lo, hi = float(scores.min()), float(scores.max())
+    if hi - lo < 1e-9:
+        return np.zeros_like(scores)
+    return (scores - lo) / (hi - lo)
+
+
+def blend_scores(embedding_scores, trait_scores, trait_score_weight):
+    """(1 - w) · embedding cosine + w · trait correlation, per career.
+
+    Titan cosines bunch in a narrow band while correlations spread over
+    [-1, 1], so both are min-max rescaled over the candidates first —
+    w is then the trait signal's actual share of the ranking.
+    """
+    w = float(trait_score_weight)
+    return (1.0 - w) * min_max(embedding_scores) + w * min_max(trait_scores)
+
+
+def rank(titles, scores, top_k=None):
+    return [(titles[i], round(float(scores[i]), 4)) for i in top_k_indices(scores, top_k)]
+
+
+# ============================================================
+#  FILE FORMAT
+# ============================================================
+# {"format": 1, "model_id": "...", "traits": [18 names],
+#  "careers": [{"name", "category", "description", "hash", "profile": [18 floats]}]}
+
+def save_trait_profiles(careers, profiles, model_id, path=TRAITS_PATH):
+    data = {
+        "format": TRAITS_FORMAT,
+        "model_id": model_id,
+        "traits": list(TRAIT_NAMES),
+        "careers": [
+            dict(c, profile=[round(float(x), 2) for x in row])
+            for c, row in zip(careers, profiles)
+        ],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_trait_profiles(path=TRAITS_PATH):
+    """(careers, profile matrix) — careers keep their name/category/description/hash."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("format") != TRAITS_FORMAT:
+        raise ValueError(f"unsupported career traits format: {data.get('format')}")
+    if tuple(data.get("traits", ())) != TRAIT_NAMES:
+        raise ValueError(f"{path}: trait names do not match SKILL_NAMES + INTEREST_NAMES")
+
+    careers = [{k: v for k, v in c.items() if k != "profile"} for c in data["careers"]]
+    profiles = np.array([c["profile"] for c in data["careers"]], dtype=np.float32).reshape(-1, TRAIT_DIM)
+    return careers, profiles
+
+
+def trait_profiles_exist(path=TRAITS_PATH):
+    return os.path.exists(path)
+
+
+def load_trait_matcher(path=TRAITS_PATH):
+    careers, profiles = load_trait_profiles(path)
+    return TraitMatcher([c["name"] for c in careers], profiles)
+
+
+__all__ = [
+    "TRAIT_NAMES",
+    "TRAIT_DIM",
+    "TraitMatcher",
+    "trait_vector",
+    "blend_scores",
+    "rank",
+    "save_trait_profiles",
+    "load_trait_profiles",
+    "load_trait_matcher",
+    "trait_profiles_exist",
+]
@@ -0,0 +1,104 @@
+# check_degraded_mode.py
+#
+# Regression checks for the degraded paths — Titan / Nova failing, over
+# budget or out of quota — run against the fake backends, offline.
+#
+#   python check_degraded_mode.py          # exit 1 if any check fails
+import sys
+import time
+
+import backends
+
+backends.install_fakes()
+
+import match_student_to_careers as m                 # noqa: E402
+from admission import Overloaded                      # noqa: E402
+from circuit_breaker import HALF_OPEN, CircuitBreaker  # noqa: E402
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker("titan-check", failure_threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def _with_titan(embed, breaker):
+    saved = m.get_embedding, m.titan_breaker
+    m.get_embedding, m.titan_breaker = embed, breaker
+    try:
+        return m.get_embedding_within_budget("I make beats in my room.", budget=0.2)
+    finally:
+        m.get_embedding, m.titan_breaker = saved
+
+
+# ============================================================
+#  CHECKS
+# ============================================================
+
+def check_overloaded_trial_releases_breaker():
+    """A half-open trial that never got quota must not wedge the breaker."""
+    def overloaded(text):
+        raise Overloaded("no quota")
+
+    breaker = _half_open_breaker()
+    assert _with_titan(overloaded, breaker) is None
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow(), "breaker stuck half-open after an Overloaded trial"
+
+
+def check_hung_trial_reopens_breaker():
+    """A trial that hangs past the budget without queueing counts as a failure."""
+    def hangs(text):
+        time.sleep(0.5)
+
+    breaker = _half_open_breaker()
+    assert _with_titan(hangs, breaker) is None
+    assert not breaker.allow(), "hung Titan call was not counted as a failure"
+
+
+def check_results_survive_bedrock_down():
+    """Titan and Nova both failing still yields lexical matches, persona and report."""
+    from results_pipeline import run_results_pipeline
+
+    down = backends.LatencyProfile(median=0.001, p95=0.002, error_rate=1.0)
+    backends.install_fakes(bedrock=backends.FakeBedrockRuntime(embed_latency=down, converse_latency=down))
+    saved = m.titan_breaker
+    m.titan_breaker = CircuitBreaker("titan-check")
+    try:
+        chat = [{"role": "user", "content": "I film my skate crew and edit the videos."}]
+        stages = dict(run_results_pipeline(chat, m.get_career_catalog(), top_k=5))
+    finally:
+        m.titan_breaker = saved
+        backends.install_fakes()
+
+    results = stages["done"]
+    assert results.get("fallback") == "lexical", results.get("fallback")
+    assert results["traits"] == {}
+    assert results["matches"] and results["persona"]["name"] and results["report"]
+
+
+CHECKS = [
+    check_overloaded_trial_releases_breaker,
+    check_hung_trial_reopens_breaker,
+    check_results_survive_bedrock_down,
+]
+
+
+def main():
+    failed = False
+    for check in CHECKS:
+        try:
+            check()
+        except Exception as e:
+            failed = True
+            print(f"✗ {check.__name__}: {e!r}")
+        else:
+            print(f"✔ {check.__name__}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# check_import_time.py
+#
+# Import-time budget for the modules Streamlit pages import on first load.
+# Each module is imported in a fresh interpreter with AWS credentials
+# stripped and sockets blocked, so any client creation that talks to the
+# network or any model call at import time fails loudly.
+#
+#   python check_import_time.py            # exit 1 if over budget
+import os
+import subprocess
+import sys
+
+# seconds, measured cold in a fresh interpreter
+IMPORT_BUDGETS = {
+    "match_student_to_careers": 0.5,
+    "spark_conversation": 1.0,
+    "db": 1.0,
+    "spark_flow": 1.0,
+}
+
+CHILD = """
+import socket, sys, time
+
+def _blocked(*args, **kwargs):
+    raise RuntimeError("network access during import")
+
+socket.socket.connect = _blocked
+socket.create_connection = _blocked
+
+t = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - t)
+"""
+
+
+def measure(module, repeats=3):
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AWS_")}
+    env["AWS_CONFIG_FILE"] = os.devnull
+    env["AWS_SHARED_CREDENTIALS_FILE"] = os.devnull
+
+    best = None
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, module],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{out.stderr}")
+        t = float(out.stdout.strip().splitlines()[-1])
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    failed = False
+    for module, budget in IMPORT_BUDGETS.items():
+        try:
+            t = measure(module)
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            failed = True
+            continue
+
+        ok = t <= budget
+        failed |= not ok
+        print(f"{'✔' if ok else '✗'} {module}: {t * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
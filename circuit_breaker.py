@@ -0,0 +1,73 @@
+# circuit_breaker.py
+import threading
+import time
+
+
+# ============================================================
+#  CIRCUIT BREAKER
+# ============================================================
+#   closed     calls go through; `failure_threshold` failures in a row
+#              (errors or calls over the latency budget) open the circuit
+#   open       calls are skipped for `reset_after` seconds
+#   half-open  one trial call goes through; success closes the circuit,
+#              failure opens it again, and a trial that says nothing about
+#              the upstream (e.g. it never got quota) is released with
+#              release_trial() so the next call can try
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_after=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_after:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self):
+        """True if a call may go ahead now."""
+        with self._lock:
+            state = self._state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release_trial(self):
+        """The call ended without a success or failure to record."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            trial, self._trial_running = self._trial_running, False
+            if trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                print(f"Circuit '{self.name}' open for {self.reset_after:.0f}s")
@@ -0,0 +1,133 @@
+# conversation_context.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import bind
+
+
+# ============================================================
+# Bounded conversation context
+# ============================================================
+# Each Groq turn gets: system prompt + running summary of older turns +
+# the last `keep_messages` messages verbatim, capped at `token_budget`.
+# Older messages are folded into the summary in the background after a
+# turn finishes, so the next turn usually doesn't wait for summarization —
+# it uses whatever summary is ready. Only when the unsummarized messages
+# no longer fit the budget does a turn fold them synchronously; if that
+# fails they are sent verbatim over budget rather than dropped.
+
+DEFAULT_KEEP_MESSAGES = 8
+DEFAULT_TOKEN_BUDGET = 1500
+
+# one shared pool for all sessions; summaries are short, cheap calls
+_summary_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="spark-summary")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting English chat
+    return len(text) // 4 + 4
+
+
+class ConversationContext:
+    def __init__(self, summarize, keep_messages=DEFAULT_KEEP_MESSAGES,
+                 token_budget=DEFAULT_TOKEN_BUDGET):
+        # summarize(previous_summary, messages) -> new summary text
+        self.summarize = summarize
+        self.keep_messages = keep_messages
+        self.token_budget = token_budget
+
+        self.summary = ""
+        self.summarized_upto = 0      # chat_history[:summarized_upto] is in the summary
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def messages(self, system_prompt, chat_history):
+        """Messages for the next turn, within the token budget when possible."""
+        out, cut = self._build(system_prompt, chat_history)
+        if cut is not None:
+            # older messages don't fit and aren't in the summary yet — fold
+            # them now instead of silently leaving them out
+            self._fold_now(chat_history, cut)
+            out, cut = self._build(system_prompt, chat_history)
+            if cut is not None:
+                out, _ = self._build(system_prompt, chat_history, bounded=False)
+        return out
+
+    def _build(self, system_prompt, chat_history, bounded=True):
+        """(messages, cut): chat_history[summarized_upto:cut] did not fit (cut None if all did)."""
+        with self._lock:
+            summary = self.summary
+            upto = self.summarized_upto
+
+        out = [{"role": "system", "content": system_prompt}]
+        budget = self.token_budget - estimate_tokens(system_prompt)
+
+        if summary:
+            note = f"Summary of the earlier conversation with this student:\n{summary}"
+            out.append({"role": "system", "content": note})
+            budget -= estimate_tokens(note)
+
+        # everything not yet summarized is a candidate; newest first until the
+        # budget runs out (the latest message is always sent)
+        tail = []
+        cut = None
+        for i in range(len(chat_history) - 1, upto - 1, -1):
+            msg = chat_history[i]
+            cost = estimate_tokens(msg["content"])
+            if bounded and tail and cost > budget:
+                cut = i + 1
+                break
+            tail.append(msg)
+            budget -= cost
+
+        out.extend(reversed(tail))
+        return out, cut
+
+    def _fold_now(self, chat_history, cutoff):
+        try:
+            self.wait()               # an in-flight fold may already cover them
+        except Exception:
+            pass
+        with self._lock:
+            if cutoff <= self.summarized_upto:
+                return
+            previous = self.summary
+            start = self.summarized_upto
+            batch = [dict(m) for m in chat_history[start:cutoff]]
+        self._fold(previous, batch, start, cutoff)
+
+    def update_async(self, chat_history):
+        """Fold messages older than the verbatim window into the summary, off-thread."""
+        with self._lock:
+            cutoff = len(chat_history) - self.keep_messages
+            if cutoff <= self.summarized_upto:
+                return None
+            if self._pending is not None and not self._pending.done():
+                return self._pending      # next turn will pick up the rest
+
+            previous = self.summary
+            start = self.summarized_upto
+            batch = [dict(m) for m in chat_history[start:cutoff]]
+            self._pending = _summary_pool.submit(bind(self._fold), previous, batch, start, cutoff)
+            return self._pending
+
+    def _fold(self, previous, batch, start, cutoff):
+        try:
+            summary = (self.summarize(previous, batch) or "").strip()
+            if not summary:
+                raise ValueError("empty summary")
+        except Exception as e:
+            # keep sending those turns verbatim; retry after the next turn
+            print(f"Conversation summary failed: {e}")
+            return
+
+        with self._lock:
+            if self.summarized_upto != start:
+                return                # another fold got there first
+            self.summary = summary
+            self.summarized_upto = cutoff
+
+    def wait(self, timeout=None):
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout=timeout)
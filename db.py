@@ -1,55 +1,80 @@
-import boto3
+import atexit
+import json
+import os
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from decimal import Decimal
+
+from aws_clients import get_resource
+from botocore.exceptions import ClientError
+
+import backends
+from backends import fake_client
+from tracing import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 TABLE_NAME = "spark_users"
+DYNAMODB_REGION = "us-east-2"  # Ohio region
 
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name="us-east-2"  # Ohio region
-)
+_table = None
+_table_lock = threading.Lock()
 
-table = dynamodb.Table(TABLE_NAME)
 
+def get_table():
+    # created on first use so importing db.py stays offline and cheap
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = fake_client("dynamodb") or get_resource(
+                    "dynamodb", DYNAMODB_REGION
+                ).Table(TABLE_NAME)
+    return _table
 
-def create_user():
-    user_id = str(uuid.uuid4())
-
-    item = {
-        "user_id": user_id,
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
-        "answers": {},
-        "traits": {},
-        "persona": {},
-        "matches": [],
-        "saved_careers": []
-    }
 
-    table.put_item(Item=item)
-    return user_id
+def __getattr__(name):
+    if name == "table":
+        return get_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def get_user(user_id):
-    response = table.get_item(Key={"user_id": user_id})
-    return response.get("Item")
+def to_dynamo(value):
+    """DynamoDB rejects floats — convert to Decimal (tuples become lists)."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    return value
 
 
-def update_user(user_id, data: dict):
-    data["updated_at"] = datetime.utcnow().isoformat()
+def create_user():
+    """New user id. Nothing is written until the user's first update_user()."""
+    return str(uuid.uuid4())
 
-    update_expr = "SET " + ", ".join(f"{k}= :{k}" for k in data.keys())
-    values = {f":{k}": v for k, v in data.items()}
 
-    table.update_item(
-        Key={"user_id": user_id},
-        UpdateExpression=update_expr,
-        ExpressionAttributeValues=values
-    )
+def get_user(user_id):
+    """The stored item with any not-yet-flushed writes applied on top."""
+    response = get_table().get_item(Key={"user_id": user_id})
+    item = response.get("Item")
+    pending = get_writer().pending(user_id)
+    if pending:
+        item = {**(item or {"user_id": user_id}), **pending}
+    return item
+
+
+def update_user(user_id, data: dict):
+    """Queue attributes for user_id; returns at once (see WriteBehind)."""
+    get_writer().put(user_id, data)
 
 
 def add_saved_career(user_id, title, score):
-    user = get_user(user_id)
+    user = get_user(user_id) or {}
     saved = user.get("saved_careers", [])
     saved.append({"title": title, "score": float(score)})
 
@@ -57,3 +82,313 @@ def add_saved_career(user_id, title, score):
         user_id,
         {"saved_careers": saved}
     )
+
+
+def flush_writes(timeout=30.0):
+    """Block until everything queued so far has been written (or retried out)."""
+    return get_writer().flush(timeout)
+
+
+# ============================================================
+#  WRITE-BEHIND QUEUE
+# ============================================================
+# update_user() only records the new attributes; a background thread
+# writes them every FLUSH_SECONDS (sooner once FLUSH_BATCH users are
+# waiting). Several updates to one user between flushes become a single
+# UpdateItem, and the first one creates the item (created_at via
+# if_not_exists), so visitors who never chat never cost a write.
+#
+# DynamoDB's BatchWriteItem can only replace whole items, so a flush
+# sends one UpdateItem per user, all of them concurrently. A write that
+# fails with a throttling / server error stays queued (newer attributes
+# win) and is retried with its own backoff, so one bad user never delays
+# the rest. Errors that retrying can't fix (ValidationException, an item
+# over 400 KB, ...) — or MAX_ATTEMPTS failures of any kind — move the
+# write to the dead-letter file and out of the queue.
+#
+# Every accepted write is appended (and fsynced) to this process's spool
+# file before update_user() returns; the spool is rewritten with whatever
+# is still pending after each flush. On start-up, spool files left by
+# processes that are no longer running are replayed, so a crash loses
+# nothing that update_user() accepted.
+#
+#   SPARK_WRITE_FLUSH_SECONDS=2      flush interval
+#   SPARK_WRITE_SPOOL_DIR=path       spool directory ("" disables the spool)
+
+FLUSH_SECONDS = float(os.getenv("SPARK_WRITE_FLUSH_SECONDS", "2.0"))
+FLUSH_BATCH = 25
+MAX_ATTEMPTS = 8
+MAX_BACKOFF_SECONDS = 60.0
+SPOOL_DIR = os.getenv("SPARK_WRITE_SPOOL_DIR", os.path.join(BASE_DIR, "spark_write_spool"))
+DEAD_LETTER_PATH = os.path.join(BASE_DIR, "spark_write_deadletter.jsonl")
+
+RETRYABLE_ERRORS = frozenset({
+    "ThrottlingException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+    "TransactionConflictException",
+})
+
+
+def is_retryable(error):
+    """Throttling, 5xx and connection errors are; other ClientErrors are not."""
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in RETRYABLE_ERRORS
+    return True
+
+
+def _update_args(user_id, data):
+    data = dict(data, updated_at=datetime.utcnow().isoformat())
+    names = {f"#{k}": k for k in data}
+    values = {f":{k}": to_dynamo(v) for k, v in data.items()}
+    values[":created_at"] = data["updated_at"]
+    sets = [f"#{k} = :{k}" for k in data]
+    sets.append("#created_at = if_not_exists(#created_at, :created_at)")
+    names["#created_at"] = "created_at"
+    return {
+        "Key": {"user_id": user_id},
+        "UpdateExpression": "SET " + ", ".join(sets),
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Spool:
+    """Append-only, fsynced journal of accepted writes — one file per process.
+
+    Files are named <pid>-<random>.jsonl: a restarted process often gets
+    the crashed one's pid (pid 1 in a container), and must still see that
+    file as an orphan rather than reopen it as its own.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:12]}.jsonl")
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, user_id, data):
+        line = json.dumps({"user_id": user_id, "data": data}, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def rewrite(self, snapshot):
+        """Replace the journal with snapshot() — taken under the spool lock,
+        so no append can land between reading the queue and replacing the file."""
+        with self._lock:
+            pending = snapshot()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for user_id, attrs in pending.items():
+                    f.write(json.dumps({"user_id": user_id, "data": attrs}, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def orphans(self):
+        """{user_id: attrs} from spools of processes that are gone, plus their paths."""
+        entries, paths = {}, []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            stem, ext = os.path.splitext(name)
+            pid = stem.split("-", 1)[0]      # "<pid>-<random>", or "<pid>" from older builds
+            if ext != ".jsonl" or not pid.isdigit() or path == self.path:
+                continue
+            if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue        # torn last line from a crash mid-append
+                    entries.setdefault(entry["user_id"], {}).update(entry["data"])
+            paths.append(path)
+        return entries, paths
+
+
+class WriteBehind:
+    def __init__(self, write, spool_dir=None, dead_letter_path=None,
+                 flush_seconds=FLUSH_SECONDS, workers=4):
+        self._write = write                  # write(user_id, attrs) -> response
+        self.dead_letter_path = dead_letter_path
+        self.flush_seconds = flush_seconds
+        self._pending = {}                   # user_id → attrs not yet written
+        self._flushing = {}                  # the batch being written right now
+        self._attempts = {}                  # user_id → failed attempts so far
+        self._retry_at = {}                  # user_id → monotonic time of next try
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spark-write")
+        self._thread = None
+        self.updates = 0                     # update_user() calls accepted
+        self.writes = 0                      # UpdateItems sent successfully
+        self.failures = 0
+        self.dead_lettered = 0
+
+        self.spool = Spool(spool_dir) if spool_dir else None
+        if self.spool is not None:
+            self._replay()
+
+    # --------------------------------------------------------
+    #  callers
+    # --------------------------------------------------------
+    def put(self, user_id, data):
+        with self._cond:
+            self._pending.setdefault(user_id, {}).update(data)
+            self.updates += 1
+            self._start()
+            if len(self._pending) >= FLUSH_BATCH:
+                self._cond.notify_all()
+        # disk I/O outside the queue lock; returns once the entry is on disk
+        if self.spool is not None:
+            self.spool.append(user_id, data)
+
+    def pending(self, user_id):
+        with self._cond:
+            return {**self._flushing.get(user_id, {}), **self._pending.get(user_id, {})}
+
+    def flush(self, timeout=None):
+        """True once nothing is pending or in flight (backoffs are respected)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._start()
+                self._cond.wait(timeout=remaining)
+            return True
+
+    # --------------------------------------------------------
+    #  background flushing
+    # --------------------------------------------------------
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="spark-write-behind", daemon=True)
+            self._thread.start()
+
+    def _due(self):
+        now = time.monotonic()
+        return [u for u in self._pending if self._retry_at.get(u, 0.0) <= now]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                self._cond.wait(timeout=self.flush_seconds)
+                due = self._due()
+                if not due:
+                    continue            # only backed-off users — check again next interval
+                batch = {u: self._pending.pop(u) for u in due}
+                self._flushing = batch
+
+            errors = self._write_batch(batch)
+            dead = []
+
+            with self._cond:
+                for user_id in batch:
+                    if user_id not in errors:
+                        self._attempts.pop(user_id, None)
+                        self._retry_at.pop(user_id, None)
+                        continue
+                    attempts = self._attempts.get(user_id, 0) + 1
+                    error = errors[user_id]
+                    if not is_retryable(error) or attempts >= MAX_ATTEMPTS:
+                        # newer attributes queued meanwhile still get their own try
+                        self._attempts.pop(user_id, None)
+                        self._retry_at.pop(user_id, None)
+                        dead.append((user_id, batch[user_id], error, attempts))
+                        continue
+                    self._attempts[user_id] = attempts
+                    self._retry_at[user_id] = time.monotonic() + min(2.0 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+                    # anything queued meanwhile is newer — it wins
+                    self._pending[user_id] = {**batch[user_id], **self._pending.get(user_id, {})}
+                self._flushing = {}
+
+            for entry in dead:
+                self._dead_letter(*entry)
+            if self.spool is not None:
+                self.spool.rewrite(self._snapshot)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _snapshot(self):
+        with self._cond:
+            return {u: dict(a) for u, a in self._pending.items()}
+
+    def _write_batch(self, batch):
+        """{user_id: exception} for the writes that failed."""
+        futures = {self._pool.submit(self._write, uid, attrs): uid for uid, attrs in batch.items()}
+        errors = {}
+        for fut, user_id in futures.items():
+            try:
+                fut.result()
+                self.writes += 1
+            except Exception as e:
+                self.failures += 1
+                errors[user_id] = e
+                print(f"Write for {user_id} failed ({e}) — "
+                      + ("will retry" if is_retryable(e) else "not retryable"))
+        return errors
+
+    def _dead_letter(self, user_id, attrs, error, attempts):
+        self.dead_lettered += 1
+        print(f"Dropping write for {user_id} after {attempts} attempt(s): {error}")
+        if not self.dead_letter_path:
+            return
+        record = {"ts": datetime.utcnow().isoformat(), "user_id": user_id,
+                  "error": repr(error), "attempts": attempts, "data": attrs}
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def _replay(self):
+        entries, paths = self.spool.orphans()
+        if entries:
+            print(f"Replaying {len(entries)} queued user writes from {len(paths)} old spool file(s)")
+            for user_id, attrs in entries.items():
+                self.put(user_id, attrs)     # into our own spool before the old files go
+        for path in paths:
+            os.remove(path)
+
+
+def _write_user(user_id, attrs):
+    with span("dynamo.update_user", attributes=len(attrs)) as s:
+        s.record(get_table().update_item(**_update_args(user_id, attrs)))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                # fake backends never touch the real spool / dead-letter file
+                real = backends.BACKEND != "fake"
+                _writer = WriteBehind(
+                    _write_user,
+                    spool_dir=(SPOOL_DIR or None) if real else None,
+                    dead_letter_path=DEAD_LETTER_PATH if real else None,
+                )
+                atexit.register(_writer.flush, 10.0)
+    return _writer
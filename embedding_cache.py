@@ -0,0 +1,186 @@
+# embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ============================================================
+#  TWO-TIER EMBEDDING CACHE
+# ============================================================
+# tier 1: bounded in-process LRU     (microseconds)
+# tier 2: SQLite file on local disk  (survives restarts, shared by
+#         the app and build_career_embeddings.py)
+#
+# Keys are (model id, dimension, sha256 of whitespace-normalized text).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.getenv("SPARK_EMBED_CACHE", os.path.join(BASE_DIR, "embedding_cache.sqlite"))
+
+DEFAULT_MEMORY_ITEMS = 2048
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def cache_key(model_id, dim, text):
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_id}|{dim}|{digest}"
+
+
+class EmbeddingCache:
+    def __init__(self, path=DEFAULT_PATH, memory_items=DEFAULT_MEMORY_ITEMS,
+                 max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.path = path                  # None → memory tier only
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl                    # seconds, None = never expire
+
+        self._lru = OrderedDict()         # key → (vector, stored_at)
+        self._lock = threading.Lock()
+        self._db = None                   # opened on first use
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------
+    #  disk tier
+    # --------------------------------------------------------
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " vec BLOB NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " used_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings(used_at)")
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings"
+            ).fetchone()[0]
+        return self._db
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _disk_get(self, key, now):
+        db = self._conn()
+        row = db.execute("SELECT vec, stored_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1], now):
+            db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            db.commit()
+            return None
+
+        db.execute("UPDATE embeddings SET used_at = ? WHERE key = ?", (now, key))
+        db.commit()
+        return np.frombuffer(row[0], dtype=np.float32), row[1]
+
+    def _disk_put(self, key, vec, now):
+        db = self._conn()
+        old = db.execute("SELECT LENGTH(vec) FROM embeddings WHERE key = ?", (key,)).fetchone()
+        self._disk_bytes += vec.nbytes - (old[0] if old else 0)
+        db.execute(
+            "INSERT OR REPLACE INTO embeddings (key, vec, stored_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, vec.tobytes(), now, now)
+        )
+        self._evict_disk(db)
+        db.commit()
+
+    def _evict_disk(self, db):
+        if not self.max_bytes or self._disk_bytes <= self.max_bytes:
+            return
+
+        # drop least recently used rows down to 90% of the budget so we
+        # don't pay for an eviction pass on every insert
+        target = int(self.max_bytes * 0.9)
+        rows = db.execute("SELECT key, LENGTH(vec) FROM embeddings ORDER BY used_at")
+        doomed = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+
+    # --------------------------------------------------------
+    #  memory tier
+    # --------------------------------------------------------
+    def _remember(self, key, vec, stored_at):
+        self._lru[key] = (vec, stored_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    # --------------------------------------------------------
+    #  public API
+    # --------------------------------------------------------
+    def get(self, model_id, dim, text):
+        key = cache_key(model_id, dim, text)
+        now = time.time()
+
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None and not self._expired(hit[1], now):
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return hit[0]
+            self._lru.pop(key, None)
+
+            if self.path:
+                found = self._disk_get(key, now)
+                if found is not None:
+                    self._remember(key, found[0], found[1])
+                    self.disk_hits += 1
+                    return found[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, model_id, dim, text, vec):
+        key = cache_key(model_id, dim, text)
+        vec = np.array(vec, dtype=np.float32)
+        vec.setflags(write=False)   # shared between callers
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, vec, now)
+            if self.path:
+                self._disk_put(key, vec, now)
+        return vec
+
+    def get_or_compute(self, model_id, dim, text, compute):
+        """compute() gets the normalized text — the same text the key hashes —
+        so a cached vector never depends on which spelling of it arrived first."""
+        vec = self.get(model_id, dim, text)
+        if vec is None:
+            vec = self.put(model_id, dim, text, compute(normalize_text(text)))
+        return vec
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._lru),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
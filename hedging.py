@@ -0,0 +1,216 @@
+# hedging.py
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import admission
+from aws_clients import MAX_POOL_CONNECTIONS
+from tracing import bind
+
+
+# ============================================================
+#  HEDGED REQUESTS WITH STAGE DEADLINES
+# ============================================================
+# A model call that has not answered by the stage's recent p95 gets a
+# duplicate (optionally to an alternate model id); whichever answers
+# first wins and the late one is discarded. At most HEDGE_MAX_EXTRA
+# duplicates are in flight process-wide, so a slow upstream can cost at
+# most that much extra quota. Every stage also has a hard deadline, after
+# which the caller gets StageTimeout instead of waiting forever.
+#
+# With quota=(account, model) the call first waits its turn in admission
+# control (the wait is not part of the deadline); a hedge is only sent if
+# quota is free right now, so hedges never queue behind real calls.
+#
+# Batch jobs wrap their calls in batch_calls(): they go straight out with
+# no hedges, deadline or admission wait, paced only by the job's own limits.
+#
+#   SPARK_HEDGING=0            plain blocking calls (no hedges, no deadlines)
+#   SPARK_HEDGE_MAX_EXTRA=8    duplicate calls allowed in flight
+#   SPARK_DEADLINE_<STAGE>     seconds, e.g. SPARK_DEADLINE_GROQ_TURN=20
+
+HEDGING = os.getenv("SPARK_HEDGING", "1") != "0"
+HEDGE_MAX_EXTRA = int(os.getenv("SPARK_HEDGE_MAX_EXTRA", "8"))
+
+MIN_SAMPLES = 20          # below this, the stage's default hedge delay is used
+MIN_HEDGE_DELAY = 0.05
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+_batch = contextvars.ContextVar("spark_batch_calls", default=False)
+
+
+@contextlib.contextmanager
+def batch_calls():
+    """hedged_call() inside the block is a plain call: no hedge, no stage
+    deadline and no interactive admission quota — the caller paces itself."""
+    token = _batch.set(True)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one stage."""
+
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100.0 * len(samples)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class StagePolicy:
+    def __init__(self, stage, deadline, hedge_after):
+        env = "SPARK_DEADLINE_" + stage.upper().replace(".", "_")
+        self.stage = stage
+        self.deadline = float(os.getenv(env, deadline))
+        self.default_hedge_after = hedge_after
+        self.latency = LatencyTracker()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        p95 = self.latency.percentile(95) if len(self.latency) >= MIN_SAMPLES else None
+        delay = self.default_hedge_after if p95 is None else p95
+        return min(max(delay, MIN_HEDGE_DELAY), self.deadline)
+
+
+# hedge delays start at these defaults and follow each stage's live p95
+POLICIES = {
+    "groq.turn": StagePolicy("groq.turn", deadline=30.0, hedge_after=2.0),
+    "nova.traits": StagePolicy("nova.traits", deadline=20.0, hedge_after=3.0),
+    "titan.embed": StagePolicy("titan.embed", deadline=10.0, hedge_after=1.0),
+}
+
+_extra = threading.BoundedSemaphore(max(HEDGE_MAX_EXTRA, 1))
+# sized with the shared botocore pool (SPARK_AWS_MAX_POOL): more threads
+# than pooled connections would only open throwaway connections to Bedrock
+_hedge_pool = ThreadPoolExecutor(max_workers=MAX_POOL_CONNECTIONS + max(HEDGE_MAX_EXTRA, 1),
+                                 thread_name_prefix="spark-hedge")
+
+
+def _timed(call, policy):
+    def run():
+        start = time.monotonic()
+        value = call()
+        policy.latency.record(time.monotonic() - start)
+        return value
+    return run
+
+
+def _discard_late(fut, discard):
+    if discard is None:
+        return
+
+    def done(f):
+        if not f.cancelled() and f.exception() is None:
+            try:
+                discard(f.result())
+            except Exception:
+                pass
+
+    fut.add_done_callback(done)
+
+
+def hedged_call(stage, call, alternate=None, discard=None, trace=None,
+                quota=None, hedge_quota=None):
+    """call() with the stage's deadline, hedged after its p95.
+
+    alternate    zero-arg callable used for the duplicate (default: call again)
+    discard      applied to a result that lost the race (e.g. close a stream)
+    trace        tracing span; gets hedged=True / hedge_won=True when relevant
+    quota        (account, model) to take from admission control first
+    hedge_quota  (account, model) for the duplicate (default: quota)
+    """
+    if _batch.get():
+        return call()
+
+    if quota is not None:
+        queued = admission.acquire(*quota)
+        if queued and trace:
+            trace.set(queued_ms=round(queued * 1000, 1))
+
+    if not HEDGING:
+        return call()
+
+    policy = POLICIES[stage]
+    deadline = time.monotonic() + policy.deadline
+
+    primary = _hedge_pool.submit(bind(_timed(call, policy)))
+    done, _ = wait([primary], timeout=policy.hedge_delay())
+    if done:
+        return primary.result()
+
+    hedge = None
+    hedge_quota = hedge_quota or quota
+    if (HEDGE_MAX_EXTRA > 0 and _extra.acquire(blocking=False)
+            and (hedge_quota is None or _hedge_admitted(hedge_quota))):
+        hedge = _hedge_pool.submit(bind(_timed(alternate or call, policy)))
+        hedge.add_done_callback(lambda f: _extra.release())
+        policy.hedges += 1
+        if trace:
+            trace.set(hedged=True)
+
+    pending = {f for f in (primary, hedge) if f is not None}
+    error = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                for other in pending:
+                    _discard_late(other, discard)
+                if fut is hedge:
+                    policy.hedge_wins += 1
+                    if trace:
+                        trace.set(hedge_won=True)
+                return fut.result()
+            error = error or fut.exception()
+
+    if pending:
+        for fut in pending:
+            _discard_late(fut, discard)
+        raise StageTimeout(f"{stage} did not answer within {policy.deadline:.0f}s")
+    raise error
+
+
+def _hedge_admitted(quota):
+    if admission.try_acquire(*quota):
+        return True
+    _extra.release()
+    return False
+
+
+def close_stream(stream):
+    """discard= for streaming responses: drop the connection."""
+    close = getattr(stream, "close", None)
+    if close:
+        close()
+
+
+def close_body(response):
+    """discard= for Bedrock invoke_model: release the unread body's connection."""
+    close_stream(response.get("body"))
@@ -0,0 +1,121 @@
+# lexical_index.py
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from career_matcher import top_k_indices
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CAREERS_PATH = os.path.join(BASE_DIR, "careers_midsize.json")
+
+
+# ============================================================
+#  TOKENIZER
+# ============================================================
+# Lowercase words, stopwords dropped, and a crude suffix strip so that
+# "editing" / "editor", "dancer" / "dancing" and "music" / "musician"
+# land on the same term. Good enough for short career descriptions.
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i i'm im in into is it its
+like me my of on or so that the their them they this to too was we were
+with you your really just love lot lots also about all am do did get got
+""".split())
+
+SUFFIXES = ("ments", "ment", "ians", "ian", "ings", "ing", "ers", "er",
+            "ors", "or", "ies", "es", "ed", "s", "e", "y")
+
+
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    return [stem(w) for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+
+
+# ============================================================
+#  BM25 INDEX
+# ============================================================
+
+class BM25Index:
+    """In-memory inverted index; per-posting BM25 weights are precomputed,
+    so a query is one scatter-add per query term."""
+
+    def __init__(self, titles, docs, k1=1.5, b=0.75):
+        self.titles = list(titles)
+        self.k1 = k1
+        n = len(docs)
+
+        counts = [Counter(tokenize(d)) for d in docs]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        avg = float(lengths.mean()) if n and lengths.mean() > 0 else 1.0
+
+        postings = defaultdict(lambda: ([], []))
+        for i, c in enumerate(counts):
+            for term, tf in c.items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+
+        self.idf = {}
+        self.postings = {}
+        for term, (ids, tfs) in postings.items():
+            ids = np.array(ids, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            idf = math.log(1.0 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[ids] / avg)
+            self.idf[term] = idf
+            self.postings[term] = (ids, (idf * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def scores(self, text):
+        """BM25 per career, scaled by the query's best possible score (0–1)."""
+        out = np.zeros(len(self.titles), dtype=np.float32)
+        ceiling = 0.0
+        for term, qtf in Counter(tokenize(text)).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, weights = posting
+            out[ids] += qtf * weights
+            ceiling += qtf * self.idf[term] * (self.k1 + 1.0)
+        if ceiling:
+            out /= ceiling
+        return out
+
+    def match(self, text, top_k=None):
+        """[(title, score), ...] best first — same contract as CareerMatcher.match."""
+        scores = self.scores(text)
+        return [
+            (self.titles[i], round(float(scores[i]), 4))
+            for i in top_k_indices(scores, top_k)
+        ]
+
+
+def career_document(career):
+    # the name counts twice: a title hit says more than a description hit
+    name = career.get("name", "")
+    return f"{name} {name} {career.get('category', '')} {career.get('description', '')}"
+
+
+def build_lexical_index(titles, path=CAREERS_PATH):
+    """BM25 over careers_midsize.json text, rows in the order of `titles`.
+
+    Careers missing from the file are indexed by their title alone.
+    """
+    careers = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            careers = {c["name"]: c for c in json.load(f)["careers"]}
+
+    docs = [career_document(careers.get(t, {"name": t})) for t in titles]
+    return BM25Index(titles, docs)
@@ -0,0 +1,279 @@
+# load_test.py
+#
+# Concurrent multi-session load test for the SparkPath flow.
+#
+# Each simulated student walks the same path the Streamlit pages do,
+# through the same code (spark_flow.py is shared with the page):
+#
+#   app.py                 create_user
+#   1_Career_Explorer.py   spark_flow.run_turn per message, final_results,
+#                          save_results (write-behind)
+#
+#   SPARK_BACKEND=fake python load_test.py --sessions 1,4,16,64
+#   python load_test.py --backend aws --sessions 1,2,4     # real services
+#
+# Results (throughput, p50/p95/p99 per stage, degradation point) are written
+# as JSON so runs can be compared between releases.
+import argparse
+import json
+import os
+import platform
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+STUDENT_MESSAGES = [
+    "I edit TikToks for my friends and love making transitions hit the beat.",
+    "I worked at Publix as a cashier and helped customers every day.",
+    "I write short stories and sometimes turn them into scripts.",
+    "I make beats in my room and post them online.",
+    "I'm always the one planning events and keeping the group organized.",
+    "I dance competitively and help choreograph our team routines.",
+    "I draw characters and design outfits for them.",
+    "I film my skate crew and edit the videos.",
+    "I love talking to people and solving problems on the spot.",
+    "I run a small resale business selling thrifted clothes.",
+]
+
+STAGES = ("create_user", "turn_first_token", "turn", "results", "persist", "session")
+
+
+# ============================================================
+#  METRICS
+# ============================================================
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def error(self, stage):
+        with self._lock:
+            self.errors[stage] += 1
+
+    def timed(self, stage, fn, *args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            self.error(stage)
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - t)
+
+    def summary(self):
+        out = {}
+        for stage in STAGES:
+            values = self.samples.get(stage, [])
+            if not values and not self.errors.get(stage):
+                continue
+            arr = np.array(values) if values else np.zeros(1)
+            out[stage] = {
+                "count": len(values),
+                "errors": self.errors.get(stage, 0),
+                "mean": float(arr.mean()),
+                "p50": float(np.percentile(arr, 50)),
+                "p95": float(np.percentile(arr, 95)),
+                "p99": float(np.percentile(arr, 99)),
+                "max": float(arr.max()),
+            }
+        return out
+
+
+# ============================================================
+#  ONE SIMULATED SESSION
+# ============================================================
+
+def run_session(timer, rng, max_turns, think_time):
+    from db import create_user
+    from match_student_to_careers import get_career_catalog
+    from speculative import SpeculativeProfiler
+    from spark_conversation import new_conversation_context
+    from spark_flow import GREETING, final_results, run_turn, save_results
+    from tracing import set_session
+
+    set_session(f"load-{uuid.uuid4().hex[:8]}")
+    start = time.perf_counter()
+    user_id = timer.timed("create_user", create_user)
+
+    catalog = get_career_catalog()
+    profiler = SpeculativeProfiler(catalog, top_k=5)
+    context = new_conversation_context()
+    chat = [{"role": "assistant", "content": GREETING}]
+    traits = None
+
+    for _ in range(max_turns):
+        if think_time:
+            time.sleep(rng.uniform(0.5, 1.5) * think_time)
+
+        chat.append({"role": "user", "content": rng.choice(STUDENT_MESSAGES)})
+        t = time.perf_counter()
+        first = []
+
+        def render(stream):
+            # stands in for st.write_stream: drain the tokens, note the first
+            parts = []
+            for chunk in stream:
+                if not first:
+                    first.append(time.perf_counter())
+                parts.append(chunk)
+            return "".join(parts)
+
+        try:
+            ready, traits = run_turn(chat, context, profiler, traits, render=render)
+        except Exception:
+            timer.error("turn")
+            raise
+        finally:
+            timer.record("turn", time.perf_counter() - t)
+            if first:
+                timer.record("turn_first_token", first[0] - t)
+
+        if ready:
+            break
+
+    results = timer.timed("results", final_results, chat, catalog, profiler, traits)
+    timer.timed("persist", save_results, user_id, chat, results)
+
+    timer.record("session", time.perf_counter() - start)
+
+
+# ============================================================
+#  LOAD LEVELS
+# ============================================================
+
+def run_level(concurrency, sessions_per_worker, max_turns, think_time, seed):
+    timer = StageTimer()
+    failures = []
+
+    def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        for _ in range(sessions_per_worker):
+            try:
+                run_session(timer, rng, max_turns, think_time)
+            except Exception as e:
+                failures.append(repr(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    done = len(timer.samples.get("session", []))
+    return {
+        "concurrency": concurrency,
+        "sessions": done,
+        "failed_sessions": len(failures),
+        "failure_examples": failures[:5],
+        "elapsed_s": elapsed,
+        "throughput_sessions_per_s": done / elapsed if elapsed else 0.0,
+        "stages": timer.summary(),
+    }
+
+
+def degradation_point(levels, stage="session", factor=2.0):
+    """First concurrency whose p95 for `stage` exceeds factor × the lowest level's p95."""
+    base = levels[0]["stages"].get(stage, {}).get("p95")
+    if not base:
+        return None
+    for level in levels[1:]:
+        p95 = level["stages"].get(stage, {}).get("p95")
+        if p95 is not None and p95 > factor * base:
+            return level["concurrency"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SparkPath session load test.")
+    parser.add_argument("--sessions", default="1,4,16,32",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--per-worker", type=int, default=2,
+                        help="sessions each concurrent student runs back to back")
+    parser.add_argument("--max-turns", type=int, default=6)
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean seconds a student pauses before each message")
+    parser.add_argument("--backend", choices=("fake", "aws"), default=os.getenv("SPARK_BACKEND", "fake"))
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="fake backends: multiply injected latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake backends: 5xx rate")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fake backends: throttle rate")
+    parser.add_argument("--groq-rpm", type=int, default=0,
+                        help="fake backends: Groq account quota (requests/min, 0 = none)")
+    parser.add_argument("--bedrock-rpm", type=int, default=0,
+                        help="fake backends: Bedrock account quota (requests/min, 0 = none)")
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_test_results.json",
+                        help="JSON report path (gitignored by default)")
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        import backends
+
+        backends.LATENCY_SCALE = args.latency_scale
+        faults = {"error_rate": args.error_rate, "throttle_rate": args.throttle_rate}
+        bedrock_quota = backends.ProviderQuota(args.bedrock_rpm) if args.bedrock_rpm else None
+        groq_quota = backends.ProviderQuota(args.groq_rpm) if args.groq_rpm else None
+        backends.install_fakes(
+            bedrock=backends.FakeBedrockRuntime(
+                embed_latency=backends.LatencyProfile(median=0.12, p95=0.35, quota=bedrock_quota, **faults),
+                converse_latency=backends.LatencyProfile(median=0.6, p95=1.5, quota=bedrock_quota, **faults),
+            ),
+            groq=backends.FakeGroq(
+                first_token=backends.LatencyProfile(median=0.25, p95=0.8, quota=groq_quota, **faults),
+            ),
+            dynamodb=backends.FakeDynamoTable(
+                latency=backends.LatencyProfile(median=0.015, p95=0.05, **faults),
+            ),
+        )
+
+    levels = []
+    for concurrency in (int(c) for c in args.sessions.split(",")):
+        print(f"→ {concurrency} concurrent sessions…")
+        level = run_level(concurrency, args.per_worker, args.max_turns, args.think_time, args.seed)
+        levels.append(level)
+
+        s = level["stages"]
+        print(
+            f"  {level['throughput_sessions_per_s']:.2f} sessions/s, "
+            f"{level['failed_sessions']} failed | "
+            + " | ".join(f"{k} p95 {v['p95'] * 1000:.0f} ms" for k, v in s.items())
+        )
+
+    # persist only queues; wait for the write-behind flush before counting writes
+    from db import flush_writes, get_writer
+
+    flushed = flush_writes()
+    writer = get_writer()
+    print(f"DynamoDB: {writer.updates} update_user calls → {writer.writes} writes"
+          + ("" if flushed else " (some still queued)"))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "config": vars(args),
+        "levels": levels,
+        "dynamo_writes": {"updates": writer.updates, "writes": writer.writes, "failures": writer.failures},
+        "degradation_concurrency": degradation_point(levels, factor=args.degrade_factor),
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nDegradation point (session p95 > {args.degrade_factor}× baseline): "
+          f"{report['degradation_concurrency'] or 'not reached'}")
+    print(f"✔ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
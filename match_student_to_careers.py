@@ -1,45 +1,206 @@
-import boto3
 import json
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
 import numpy as np
 
+from aws_clients import get_client
+from backends import BACKEND, fake_client
+from career_matcher import CareerMatcher
+from career_store import EMBED_DIM, EMBED_MODEL_ID, load_catalog, store_exists
+from circuit_breaker import CircuitBreaker
+from embedding_cache import EmbeddingCache
+from admission import CallBudget, Overloaded, within
+from hedging import close_body, hedged_call
+from tracing import bind, span
+
+# Importing this module must stay cheap and offline: no AWS clients, no
+# catalog I/O and no model calls happen until a function needs them.
+# check_import_time.py enforces the budget.
+
 # ============================================================
-#  AWS BEDROCK CLIENT
+#  AWS BEDROCK CLIENT (created on first use)
 # ============================================================
 
-bedrock = boto3.Session(profile_name="AdministratorAccess-130214420636").client(
-    "bedrock-runtime",
-    region_name="us-east-1"
-)
+BEDROCK_REGION = "us-east-1"
+
+_bedrock = None
+_init_lock = threading.Lock()
+
+
+def _make_bedrock():
+    # shared, pooled client (aws_clients.py) — same one the builders use
+    return get_client("bedrock-runtime", BEDROCK_REGION)
+
+
+def get_bedrock():
+    global _bedrock
+    if _bedrock is None:
+        with _init_lock:
+            if _bedrock is None:
+                _bedrock = fake_client("bedrock") or _make_bedrock()
+    return _bedrock
 
 
 # ============================================================
 #  TITAN TEXT EMBEDDINGS
 # ============================================================
 
-def get_embedding(text: str):
+def _invoke_titan(text: str, trace=None):
     body = json.dumps({
-        "inputText": text
+        "inputText": text,
+        "dimensions": EMBED_DIM
     })
 
-    response = bedrock.invoke_model(
-        modelId="amazon.titan-embed-text-v2:0",
+    response = hedged_call("titan.embed", lambda: get_bedrock().invoke_model(
+        modelId=EMBED_MODEL_ID,
         body=body,
         contentType="application/json",
         accept="application/json"
-    )
+    ), discard=close_body, trace=trace, quota=("bedrock", EMBED_MODEL_ID))
 
     out = json.loads(response["body"].read())
+    if trace:
+        trace.record(response)
+        trace.set(cached=False, tokens_in=out.get("inputTextTokenCount", 0))
     return np.array(out["embedding"])
 
 
+# Repeat texts (page reruns, identical transcripts) skip the Titan call.
+# embedding_cache.stats() has the hit/miss counters.
+# (memory-only with fake backends so fake vectors never reach the disk cache)
+embedding_cache = EmbeddingCache(path=None) if BACKEND == "fake" else EmbeddingCache()
+
+
+def get_embedding(text: str):
+    with span("titan.embed", chars=len(text), cached=True) as s:
+        return embedding_cache.get_or_compute(
+            EMBED_MODEL_ID, EMBED_DIM, text, lambda t: _invoke_titan(t, s)
+        )
+
+
+# ============================================================
+#  DEGRADED MODE: TITAN BUDGET + CIRCUIT BREAKER
+# ============================================================
+# Results must not die with Titan. get_embedding_within_budget() returns
+# None when Titan errors, takes longer than EMBED_BUDGET_SECONDS, or has
+# failed repeatedly (the breaker then skips it for a while); callers rank
+# with match_lexical() instead. A call that overruns keeps going in the
+# background and still lands in the embedding cache.
+
+EMBED_BUDGET_SECONDS = float(os.getenv("SPARK_EMBED_BUDGET", "3.0"))
+
+titan_breaker = CircuitBreaker("titan", failure_threshold=3, reset_after=30.0)
+_budget_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="spark-titan")
+
+
+def _embed_within(text, call_budget):
+    # the admission wait ends with the caller's budget, so an abandoned
+    # call leaves the queue instead of spending quota nobody will use
+    with within(call_budget):
+        return get_embedding(text)
+
+
+def get_embedding_within_budget(text, budget=None):
+    if not titan_breaker.allow():
+        return None
+
+    call_budget = CallBudget(EMBED_BUDGET_SECONDS if budget is None else budget)
+    recorded = False
+    try:
+        fut = _budget_pool.submit(bind(_embed_within), text, call_budget)
+        emb = fut.result(timeout=call_budget.remaining())
+    except FutureTimeout:
+        # time spent queued behind our own quota is not Titan's fault; it
+        # is only blamed if it had at least half the budget to answer in
+        if call_budget.queued() < call_budget.seconds / 2:
+            titan_breaker.record_failure()
+            recorded = True
+        print("Titan over its latency budget — using lexical matching")
+        return None
+    except Overloaded:
+        print("Titan quota saturated — using lexical matching")
+        return None
+    except Exception as e:
+        titan_breaker.record_failure()
+        recorded = True
+        print(f"Titan failed ({e}) — using lexical matching")
+        return None
+    else:
+        titan_breaker.record_success()
+        recorded = True
+        return emb
+    finally:
+        if not recorded:
+            # no verdict on Titan — don't leave a half-open trial hanging
+            titan_breaker.release_trial()
+
+
 # ============================================================
 #  LOAD CAREER EMBEDDINGS
 # ============================================================
 
-with open("career_embeddings.json", "r") as f:
-    career_embeddings = json.load(f)
+# The catalog is opened on first use: the float32 matrix is memory-mapped
+# from career_embeddings.npy (falls back to career_embeddings.json). If the
+# builder also wrote a FAISS index next to it, top-k goes through the index.
+_career_catalog = None
+
+
+def get_career_catalog():
+    global _career_catalog
+    if _career_catalog is None:
+        with _init_lock:
+            if _career_catalog is None:
+                _career_catalog = _load_career_catalog()
+    return _career_catalog
+
 
-print(f"Loaded {len(career_embeddings)} career embeddings.\n")
+def _load_career_catalog():
+    store = load_catalog()
+    if store.dim != EMBED_DIM:
+        raise ValueError(
+            f"career store holds {store.dim}-dim vectors but queries are {EMBED_DIM}-dim — "
+            f"set SPARK_EMBED_DIM={store.dim} or rebuild with build_career_embeddings.py --dim {EMBED_DIM}"
+        )
+
+    # compact (int8 / float16) stores are scored in place; a FAISS index
+    # would need a float32 copy next to its own float32 rows
+    if store_exists() and store.dtype == "float32":
+        # faiss is a heavy import — only pay for it when an index exists
+        from career_index import index_exists, load_indexed_matcher
+
+        if index_exists():
+            try:
+                return load_indexed_matcher(store)
+            except ValueError as e:
+                print(f"Ignoring stale career index: {e}")
+
+    return store.matcher()
+
+
+_career_embeddings = None
+
+
+def get_career_embeddings():
+    """Legacy {title: {"description", "category", "embedding"}} dict, built once."""
+    global _career_embeddings
+    if _career_embeddings is None:
+        with _init_lock:
+            if _career_embeddings is None:
+                _career_embeddings = load_catalog().to_embeddings_dict()
+    return _career_embeddings
+
+
+def __getattr__(name):
+    # keep `from match_student_to_careers import career_embeddings` / `bedrock` working
+    if name == "career_embeddings":
+        return get_career_embeddings()
+    if name == "bedrock":
+        return get_bedrock()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ============================================================
@@ -52,21 +213,20 @@ describing their transferable skills, interests, passions, and experience.
 Return ONLY JSON. No explanations.
 """
 
-def build_trait_prompt(chat):
-    transcript = ""
-    for msg in chat:
-        who = "Student" if msg["role"] == "user" else "Assistant"
-        transcript += f"{who}: {msg['content']}\n"
-
-    user_prompt = f"""
-Analyze this conversation:
-
-{transcript}
+SKILL_NAMES = (
+    "communication", "creativity", "organization", "leadership",
+    "visual_design", "problem_solving", "digital_fluency", "collaboration",
+    "initiative", "customer_service", "time_management",
+)
 
-Return JSON in this exact format:
+INTEREST_NAMES = (
+    "video", "music", "writing", "performance", "design", "technology",
+    "entrepreneurship",
+)
 
-{{
-  "transferable_skills": {{
+# shared with the structured chat turns in spark_conversation.py
+TRAIT_JSON_FORMAT = """{
+  "transferable_skills": {
     "communication": 0,
     "creativity": 0,
     "organization": 0,
@@ -78,8 +238,8 @@ Return JSON in this exact format:
     "initiative": 0,
     "customer_service": 0,
     "time_management": 0
-  }},
-  "interests": {{
+  },
+  "interests": {
     "video": 0,
     "music": 0,
     "writing": 0,
@@ -87,42 +247,100 @@ Return JSON in this exact format:
     "design": 0,
     "technology": 0,
     "entrepreneurship": 0
-  }},
+  },
   "passion_signals": ["keyword"],
   "work_experience_summary": "string",
   "vibe_summary": "string"
-}}
+}"""
+
+def build_trait_prompt(chat):
+    transcript = ""
+    for msg in chat:
+        who = "Student" if msg["role"] == "user" else "Assistant"
+        transcript += f"{who}: {msg['content']}\n"
+
+    user_prompt = f"""
+Analyze this conversation:
+
+{transcript}
+
+Return JSON in this exact format:
+
+{TRAIT_JSON_FORMAT}
 
 Return JSON ONLY.
 """
     return user_prompt
 
 
+def merge_traits(profile, delta):
+    """Fold traits extracted from newer messages into a running profile."""
+    if not profile:
+        return delta
+
+    merged = dict(profile)
+    for key in ("transferable_skills", "interests"):
+        scores = dict(profile.get(key, {}))
+        for name, value in delta.get(key, {}).items():
+            try:
+                scores[name] = max(scores.get(name, 0), value)
+            except TypeError:
+                scores[name] = value
+        merged[key] = scores
+
+    signals = list(profile.get("passion_signals", []))
+    signals += [s for s in delta.get("passion_signals", []) if s not in signals]
+    merged["passion_signals"] = signals
+
+    work = [profile.get("work_experience_summary", ""), delta.get("work_experience_summary", "")]
+    merged["work_experience_summary"] = " ".join(w for w in dict.fromkeys(work) if w)
+
+    merged["vibe_summary"] = delta.get("vibe_summary") or profile.get("vibe_summary", "")
+    return merged
+
+
 # ============================================================
 #  AMAZON NOVA-MICRO — CORRECT SCHEMA
 # ============================================================
 
+TRAIT_MODEL_ID = "amazon.nova-micro-v1:0"
+# model a hedged duplicate goes to when Nova is slow (None = same model)
+TRAIT_HEDGE_MODEL_ID = os.getenv("SPARK_TRAIT_HEDGE_MODEL")
+
+
 def extract_traits(chat):
     user_prompt = build_trait_prompt(chat)
 
-    response = bedrock.converse(
-        modelId="amazon.nova-micro-v1:0",
-
-        # ✔ system prompt goes here
-        system=[
-            {"text": TRAIT_SYSTEM_PROMPT}
-        ],
-
-        # ✔ messages can ONLY be user/assistant roles
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"text": user_prompt}
-                ]
-            }
-        ]
-    )
+    def converse(model_id):
+        return lambda: get_bedrock().converse(
+            modelId=model_id,
+
+            # ✔ system prompt goes here
+            system=[
+                {"text": TRAIT_SYSTEM_PROMPT}
+            ],
+
+            # ✔ messages can ONLY be user/assistant roles
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"text": user_prompt}
+                    ]
+                }
+            ]
+        )
+
+    with span("nova.traits") as s:
+        response = hedged_call(
+            "nova.traits",
+            converse(TRAIT_MODEL_ID),
+            alternate=converse(TRAIT_HEDGE_MODEL_ID) if TRAIT_HEDGE_MODEL_ID else None,
+            trace=s,
+            quota=("bedrock", TRAIT_MODEL_ID),
+            hedge_quota=("bedrock", TRAIT_HEDGE_MODEL_ID) if TRAIT_HEDGE_MODEL_ID else None
+        )
+        s.record(response)
 
     # Nova "converse" response format:
     # response["output"]["message"]["content"][0]["text"]
@@ -150,12 +368,158 @@ def cosine(a, b):
 #  CAREER MATCHING
 # ============================================================
 
-def match_careers(student_emb, career_embeddings):
-    scores = []
-    for career, data in career_embeddings.items():
-        score = cosine(student_emb, np.array(data["embedding"]))
-        scores.append((career, round(score, 4)))
-    return sorted(scores, key=lambda x: x[1], reverse=True)
+def get_matcher(career_embeddings):
+    if isinstance(career_embeddings, CareerMatcher):
+        return career_embeddings
+    if career_embeddings is _career_embeddings:
+        # our own dict view of the catalog — match on the catalog itself
+        return get_career_catalog()
+
+    # a caller's dict may be edited between calls, so it is never cached;
+    # pass a CareerMatcher to reuse the normalized matrix
+    return CareerMatcher.from_embeddings(career_embeddings)
+
+
+def match_careers(student_emb, career_embeddings, top_k=None):
+    with span("match", top_k=top_k):
+        return get_matcher(career_embeddings).match(student_emb, top_k=top_k)
+
+
+# ============================================================
+#  TRAIT-VECTOR MATCHING (no network)
+# ============================================================
+# career_traits.json (build_career_traits.py) rates every career on the
+# 18 trait dimensions extract_traits() returns. With it, careers can be
+# ranked straight from a student's traits, and blended into the embedding
+# score with SPARK_TRAIT_SCORE_WEIGHT (0 = embeddings only). Both scores
+# are rescaled to [0, 1] over the catalog before blending, so the weight
+# is the trait signal's share of the ranking. Without the file every
+# blend falls back to embeddings alone.
+
+TRAIT_SCORE_WEIGHT = float(os.getenv("SPARK_TRAIT_SCORE_WEIGHT", "0.3"))
+
+# keyed on the matcher itself; entries go away with their matcher
+_trait_catalogs = weakref.WeakKeyDictionary()
+_lexical_indexes = weakref.WeakKeyDictionary()
+
+
+def get_trait_catalog(career_embeddings=None):
+    """TraitMatcher aligned to the embedding catalog's titles, or None if not built."""
+    matcher = get_matcher(career_embeddings if career_embeddings is not None else get_career_catalog())
+    cached = _trait_catalogs.get(matcher)
+    if cached is None:
+        from career_traits import load_trait_matcher, trait_profiles_exist
+
+        traits = None
+        if trait_profiles_exist():
+            try:
+                traits = load_trait_matcher().aligned(matcher.titles)
+            except (ValueError, KeyError) as e:
+                print(f"Ignoring career trait profiles: {e}")
+        cached = (traits,)        # the value must not hold the matcher
+        with _init_lock:
+            _trait_catalogs[matcher] = cached
+    return cached[0]
+
+
+def get_lexical_index(career_embeddings=None):
+    """BM25 over the careers' name / category / description, aligned to the catalog."""
+    matcher = get_matcher(career_embeddings if career_embeddings is not None else get_career_catalog())
+    cached = _lexical_indexes.get(matcher)
+    if cached is None:
+        from lexical_index import build_lexical_index
+
+        cached = build_lexical_index(matcher.titles)
+        with _init_lock:
+            _lexical_indexes[matcher] = cached
+    return cached
+
+
+def match_lexical(text, career_embeddings, top_k=None):
+    """Keyword ranking of careers from the student's own words — no network."""
+    with span("match", top_k=top_k, mode="lexical"):
+        return get_lexical_index(career_embeddings).match(text, top_k=top_k)
+
+
+def match_by_traits(traits, career_embeddings, top_k=None):
+    """Rank careers from the trait profile alone; None if no trait profiles exist."""
+    trait_catalog = get_trait_catalog(career_embeddings)
+    if trait_catalog is None:
+        return None
+
+    from career_traits import trait_vector
+
+    with span("match", top_k=top_k, mode="traits"):
+        return trait_catalog.match(trait_vector(traits), top_k=top_k)
+
+
+def match_careers_blended(student_emb, traits, career_embeddings, top_k=None,
+                          trait_score_weight=None):
+    """match_careers, with the trait-profile score blended in when configured."""
+    w = TRAIT_SCORE_WEIGHT if trait_score_weight is None else trait_score_weight
+    trait_catalog = get_trait_catalog(career_embeddings) if w and traits else None
+    if trait_catalog is None:
+        return match_careers(student_emb, career_embeddings, top_k=top_k)
+
+    from career_traits import blend_scores, rank, trait_vector
+
+    with span("match", top_k=top_k, mode="blend"):
+        matcher = get_matcher(career_embeddings)
+        scores = blend_scores(
+            matcher.scores(student_emb), trait_catalog.scores(trait_vector(traits)), w
+        )
+        return rank(matcher.titles, scores, top_k)
+
+
+# ============================================================
+#  EMBEDDING PAYLOAD
+# ============================================================
+
+def build_embedding_payload(traits, user_text=""):
+    payload = (
+        json.dumps(traits.get("interests", {})) + " " +
+        json.dumps(traits.get("transferable_skills", {})) + " " +
+        " ".join(traits.get("passion_signals", []))
+    )
+    if user_text:
+        payload += " " + user_text
+    return payload
+
+
+def fuse_embeddings(text_emb, trait_emb, trait_weight=0.5):
+    """Blend the raw-text and trait embeddings on the unit sphere."""
+    a = np.asarray(text_emb, dtype=np.float32)
+    b = np.asarray(trait_emb, dtype=np.float32)
+    a = a / (np.linalg.norm(a) or 1.0)
+    b = b / (np.linalg.norm(b) or 1.0)
+    return (1.0 - trait_weight) * a + trait_weight * b
+
+
+# ============================================================
+#  PERSONA
+# ============================================================
+
+def infer_persona(tr, text):
+    blob = (tr.get("vibe_summary", "") + " " + text).lower()
+
+    if any(w in blob for w in ["dance", "movement", "choreo"]):
+        return {"name": "The Movement Storyteller",
+                "blurb": "You express emotion through movement and rhythm."}
+
+    if any(w in blob for w in ["camera", "film", "edit", "video"]):
+        return {"name": "The Visual Storyteller",
+                "blurb": "You see stories in scenes, angles, and imagery."}
+
+    if any(w in blob for w in ["music", "sound", "audio", "producer"]):
+        return {"name": "The Music Architect",
+                "blurb": "You shape emotion through sound and audio textures."}
+
+    if any(w in blob for w in ["write", "script", "story"]):
+        return {"name": "The Story Weaver",
+                "blurb": "You craft narratives with ideas and words."}
+
+    return {"name": "The Creative Explorer",
+            "blurb": "You’re multi-curious — Spark helps you discover your path."}
 
 
 # ============================================================
@@ -164,6 +528,10 @@ def match_careers(student_emb, career_embeddings):
 
 def build_report(traits, matches):
     top3 = matches[:3]
+    traits = {
+        "transferable_skills": {}, "interests": {}, "passion_signals": [],
+        "work_experience_summary": "", "vibe_summary": "", **(traits or {}),
+    }
 
     return f"""
 ======================
@@ -196,10 +564,10 @@ with careers in the creative industry!
 
 
 # ============================================================
-#  SAMPLE CHAT (REPLACE WITH REAL CONVERSATION)
+#  SAMPLE PIPELINE — python match_student_to_careers.py
 # ============================================================
 
-chat = [
+SAMPLE_CHAT = [
     {"role": "assistant", "content": "Tell me something you're good at or a job you had."},
     {"role": "user", "content": "I worked at Publix as a cashier and helped customers every day."},
     {"role": "assistant", "content": "What did you enjoy most about that?"},
@@ -207,30 +575,33 @@ chat = [
 ]
 
 
-# ============================================================
-#  RUN PIPELINE
-# ============================================================
+def main(chat=SAMPLE_CHAT):
+    print("\nExtracting student traits using Amazon Nova...\n")
+    traits = extract_traits(chat)
 
-print("\nExtracting student traits using Amazon Nova...\n")
-traits = extract_traits(chat)
+    print("\nTraits extracted:")
+    print(json.dumps(traits, indent=2))
 
-print("\nTraits extracted:")
-print(json.dumps(traits, indent=2))
+    student_text = (
+        json.dumps(traits["transferable_skills"]) + " " +
+        json.dumps(traits["interests"]) + " " +
+        " ".join(traits["passion_signals"]) + " " +
+        traits["work_experience_summary"]
+    )
 
-student_text = (
-    json.dumps(traits["transferable_skills"]) + " " +
-    json.dumps(traits["interests"]) + " " +
-    " ".join(traits["passion_signals"]) + " " +
-    traits["work_experience_summary"]
-)
+    print("\nGenerating student embedding...\n")
+    student_emb = get_embedding(student_text)
+
+    print("\nMatching careers...\n")
+    catalog = get_career_catalog()
+    print(f"Loaded {len(catalog)} career embeddings.\n")
+    matches = match_careers(student_emb, catalog)
 
-print("\nGenerating student embedding...\n")
-student_emb = get_embedding(student_text)
+    print("\nTop 5 Matches:")
+    print(matches[:5])
 
-print("\nMatching careers...\n")
-matches = match_careers(student_emb, career_embeddings)
+    print("\n" + build_report(traits, matches))
 
-print("\nTop 5 Matches:")
-print(matches[:5])
 
-print("\n" + build_report(traits, matches))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# resources.py
+import os
+import threading
+import uuid
+
+import numpy as np
+import streamlit as st
+
+from db import get_table
+from match_student_to_careers import get_bedrock, get_career_catalog
+from spark_conversation import get_client as get_groq_client
+from tracing import set_session
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Set SPARK_WARMUP=0 to skip the background warm-up (e.g. in CI).
+WARMUP_ENABLED = os.getenv("SPARK_WARMUP", "1") != "0"
+
+
+# ======================================================
+# SHARED RESOURCES (one per server process, all sessions)
+# ======================================================
+# The underlying getters are lazy process-wide singletons; wrapping them
+# in st.cache_resource keeps one instance across reruns and sessions and
+# lets the warm-up thread build them before the first user needs them.
+
+@st.cache_resource(show_spinner=False)
+def shared_catalog():
+    return get_career_catalog()
+
+
+@st.cache_resource(show_spinner=False)
+def static_asset(name):
+    """Text of a file next to the app, read from disk once per process."""
+    path = os.path.join(BASE_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def trace_session():
+    """Tag this rerun's spans with the browser session's trace id."""
+    if "trace_id" not in st.session_state:
+        st.session_state.trace_id = uuid.uuid4().hex[:12]
+    set_session(st.session_state.trace_id)
+
+
+# ======================================================
+# WARM-UP
+# ======================================================
+
+def _prime_connections(clients):
+    # one cheap request per upstream so the TLS handshake and the pooled
+    # connection already exist when the first student arrives
+    try:
+        clients["dynamodb"].load()            # DescribeTable
+    except Exception as e:
+        print(f"warm-up: DynamoDB not reachable ({e})")
+    try:
+        clients["groq"].models.list()
+    except Exception as e:
+        print(f"warm-up: Groq not reachable ({e})")
+
+
+def _warm_up():
+    try:
+        catalog = get_career_catalog()
+        catalog.scores(np.ones(catalog.dim, dtype=np.float32))   # fault in the mapped pages
+        get_bedrock()
+        _prime_connections({
+            "dynamodb": get_table(),
+            "groq": get_groq_client(),
+        })
+    except Exception as e:
+        print(f"warm-up failed: {e}")
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Kick off the warm-up once per process, in the background."""
+    static_asset("career_map.html")   # tiny — read inline while we have a script context
+
+    if not WARMUP_ENABLED:
+        return None
+
+    t = threading.Thread(target=_warm_up, name="spark-warmup", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,232 @@
+# results_pipeline.py
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from db import update_user
+from hedging import MIN_SAMPLES, POLICIES
+from match_student_to_careers import (
+    TRAIT_SCORE_WEIGHT,
+    build_embedding_payload,
+    build_report,
+    extract_traits,
+    fuse_embeddings,
+    get_embedding_within_budget,
+    get_trait_catalog,
+    infer_persona,
+    match_by_traits,
+    match_careers,
+    match_careers_blended,
+    match_lexical,
+)
+from tracing import bind
+
+
+# ============================================================
+#  STAGE RUNNER
+# ============================================================
+# Shared pool for the final-results stages of every session. Stages are
+# I/O bound (Nova, Titan), so threads are fine.
+
+_stage_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="spark-stage")
+
+
+class StageRunner:
+    """Runs named stages concurrently and hands them back as they finish.
+
+    Stages can be added while iterating (a stage that depends on another is
+    submitted when its input arrives). cancel() — or leaving the `with`
+    block with an exception, e.g. Streamlit stopping a rerun — drops every
+    stage that has not started yet.
+    """
+
+    def __init__(self, pool=None):
+        self._pool = pool or _stage_pool
+        self._futures = {}
+        self._cancelled = threading.Event()
+
+    def submit(self, name, fn, *args, **kwargs):
+        if self._cancelled.is_set():
+            raise CancelledError(name)
+        fut = self._pool.submit(bind(self._guard), fn, *args, **kwargs)
+        self._futures[fut] = name
+        return fut
+
+    def _guard(self, fn, *args, **kwargs):
+        if self._cancelled.is_set():
+            raise CancelledError()
+        return fn(*args, **kwargs)
+
+    def as_ready(self):
+        """Yield (name, future) in completion order until nothing is pending."""
+        while self._futures:
+            done, _ = wait(list(self._futures), return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield self._futures.pop(fut), fut
+
+    def cancel(self):
+        self._cancelled.set()
+        for fut in self._futures:
+            fut.cancel()
+        self._futures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        return False
+
+
+# ============================================================
+#  FINAL RESULTS PIPELINE
+# ============================================================
+#
+#   user text ──► Titan ───────┐
+#            └──► Nova traits ──┴─► text embedding + trait-profile score
+#
+# With career trait profiles (career_traits.json, TRAIT_SCORE_WEIGHT > 0)
+# the final matches need one round trip: Titan and Nova run side by side
+# and the trait vector is scored against the profiles locally.
+#
+# Without them the trait signal has to come from embedding the trait
+# summary, so the final matches take two round trips in series:
+#
+#   user text ──► Titan ─────────────────────────┐
+#            └──► Nova traits ──► Titan (traits) ─┴─► fused match
+#
+# Either way the raw-text embedding (or, if Nova answers first, the trait
+# vector) produces provisional matches after one round trip.
+#
+# If Titan errors or overruns its budget (or its circuit breaker is open),
+# matches come from the BM25 keyword index instead and results["fallback"]
+# is set to "lexical". If Nova fails, traits are empty and the persona and
+# report are built from the matches and the student's words alone.
+#
+# The trait embedding is a second Titan round trip after Nova. When the
+# time already spent plus Titan's recent p95 would overrun
+# RESULTS_BUDGET_SECONDS it is skipped, and the final matches are the text
+# embedding blended with the trait-profile score.
+
+RESULTS_BUDGET_SECONDS = float(os.getenv("SPARK_RESULTS_BUDGET", "4.0"))
+
+
+def trait_embedding_fits(started):
+    """Is there time left in the results budget for one more Titan call?"""
+    titan = POLICIES["titan.embed"]
+    p95 = titan.latency.percentile(95) if len(titan.latency) >= MIN_SAMPLES else None
+    expected = titan.default_hedge_after if p95 is None else p95
+    return time.monotonic() - started + expected <= RESULTS_BUDGET_SECONDS
+
+
+def trait_profiles_usable(catalog):
+    """True if traits can be scored locally (no trait-embedding round trip)."""
+    return TRAIT_SCORE_WEIGHT > 0 and get_trait_catalog(catalog) is not None
+
+
+def student_text(chat_history):
+    return " ".join(m["content"] for m in chat_history if m["role"] == "user")
+
+
+def traits_chat(user_text):
+    return [
+        {"role": "assistant", "content": "You are Spark, an entertainment career coach."},
+        {"role": "user", "content": user_text},
+    ]
+
+
+def run_results_pipeline(chat_history, catalog, top_k=5, trait_weight=0.5, traits=None):
+    """Generator of (stage, value) events; the last one is ("done", results).
+
+    Stages: "matches" (provisional, then fused), "traits", "persona", "report".
+    traits: profile already collected from structured chat turns — used
+    as-is instead of a Nova call.
+    """
+    started = time.monotonic()
+    user_text = student_text(chat_history)
+    text_emb = trait_emb = None
+    lexical = False
+    # one round trip when the trait profiles can stand in for the trait embedding
+    skip_trait_emb = trait_profiles_usable(catalog)
+    results = {}
+
+    with StageRunner() as runner:
+        runner.submit("embed_text", get_embedding_within_budget, user_text)
+        if traits:
+            runner.submit("traits", dict, traits)
+        else:
+            runner.submit("traits", extract_traits, traits_chat(user_text))
+
+        for name, fut in runner.as_ready():
+            try:
+                value = fut.result()
+            except CancelledError:
+                raise
+            except Exception as e:
+                if name != "traits":
+                    raise
+                # Nova down — results still go out, just without traits
+                print(f"Trait extraction failed ({e}) — continuing without traits")
+                value = {}
+
+            if name == "embed_text":
+                text_emb = value
+                if text_emb is None:
+                    # no Titan — rank careers from the student's own words
+                    lexical = True
+                    results["fallback"] = "lexical"
+                    results["matches"] = match_lexical(user_text, catalog, top_k=top_k)
+                    yield "matches", results["matches"]
+                elif trait_emb is None:
+                    results["matches"] = match_careers(text_emb, catalog, top_k=top_k)
+                    yield "matches", results["matches"]
+
+            elif name == "traits":
+                results["traits"] = value
+                yield "traits", value
+
+                results["persona"] = infer_persona(value, user_text)
+                yield "persona", results["persona"]
+
+                if lexical:
+                    continue
+
+                if text_emb is None and value:
+                    # Titan still busy — rank from the trait profile for now
+                    early = match_by_traits(value, catalog, top_k=top_k)
+                    if early is not None:
+                        results["matches"] = early
+                        yield "matches", early
+
+                if value and not skip_trait_emb and trait_embedding_fits(started):
+                    runner.submit("embed_traits", get_embedding_within_budget, build_embedding_payload(value))
+                else:
+                    skip_trait_emb = True
+
+            elif name == "embed_traits":
+                # None (Titan gave out half-way): the text-only matches stand
+                trait_emb = value
+
+            if (text_emb is not None and "traits" in results and "fused" not in results
+                    and (trait_emb is not None or skip_trait_emb)):
+                results["fused"] = True
+                emb = text_emb if trait_emb is None else fuse_embeddings(text_emb, trait_emb, trait_weight)
+                results["matches"] = match_careers_blended(emb, results["traits"], catalog, top_k=top_k)
+                yield "matches", results["matches"]
+
+    results.pop("fused", None)
+    results["report"] = build_report(results["traits"], results["matches"])
+    yield "report", results["report"]
+    yield "done", results
+
+
+def save_results_async(user_id, chat_history, results):
+    """Queue the session's results for DynamoDB (db's write-behind flushes them)."""
+    update_user(user_id, {
+        "answers": {"chat_history": list(chat_history)},
+        "traits": results["traits"],
+        "persona": results["persona"],
+        "matches": results["matches"],
+    })
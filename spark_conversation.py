@@ -1,15 +1,45 @@
 # spark_conversation.py
 import os
 import json
+import re
+import threading
+import time
 from groq import Groq
+from backends import fake_client
+from conversation_context import ConversationContext
+from admission import acquire
+from hedging import close_stream, hedged_call
+from tracing import span
+from match_student_to_careers import INTEREST_NAMES, SKILL_NAMES, TRAIT_JSON_FORMAT
 from dotenv import load_dotenv
 load_dotenv()
 
 
-# Groq Client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Groq Client (created on first turn)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = fake_client("groq") or Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _client
+
+
+def __getattr__(name):
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 MODEL_ID = "llama-3.1-8b-instant"
+MAX_TOKENS = 300
+TEMPERATURE = 0.7
+
+# model a hedged duplicate turn goes to when Groq is slow (None = same model)
+HEDGE_MODEL_ID = os.getenv("SPARK_GROQ_HEDGE_MODEL")
 
 SYSTEM_PROMPT = """
 You are Spark — an adaptive entertainment career coach.
@@ -40,17 +70,42 @@ def conversation_is_complete(reply: str):
 # ============================================================
 # Main Groq conversation turn
 # ============================================================
-def run_spark_turn(chat_history, profile, phase):
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    messages.extend(chat_history)
+def create_turn(trace=None, **kwargs):
+    """chat.completions.create for a turn: admission, stage deadline, hedging after p95."""
+    def call(model):
+        return lambda: get_client().chat.completions.create(model=model, **kwargs)
 
-    response = client.chat.completions.create(
-        model=MODEL_ID,
-        messages=messages,
-        max_tokens=300,
-        temperature=0.7
+    return hedged_call(
+        "groq.turn",
+        call(MODEL_ID),
+        alternate=call(HEDGE_MODEL_ID) if HEDGE_MODEL_ID else None,
+        discard=close_stream if kwargs.get("stream") else None,
+        trace=trace,
+        quota=("groq", MODEL_ID),
+        hedge_quota=("groq", HEDGE_MODEL_ID) if HEDGE_MODEL_ID else None
     )
 
+
+def build_messages(chat_history, context=None, structured=False):
+    system_prompt = STRUCTURED_SYSTEM_PROMPT if structured else SYSTEM_PROMPT
+    if context is not None:
+        return context.messages(system_prompt, chat_history)
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(chat_history)
+    return messages
+
+
+def run_spark_turn(chat_history, profile, phase, context=None):
+    with span("groq.turn", mode="plain") as s:
+        response = create_turn(
+            trace=s,
+            messages=build_messages(chat_history, context),
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE
+        )
+        s.record(response)
+
     spark_reply = response.choices[0].message.content
 
     # Tell app when to summarize/match
@@ -59,10 +114,277 @@ def run_spark_turn(chat_history, profile, phase):
     return spark_reply, profile, phase, ready
 
 
+# ============================================================
+# Streaming conversation turn
+# ============================================================
+def stream_spark_turn(chat_history, context=None):
+    """Yield Spark's reply chunk by chunk as Groq generates it.
+
+    Run conversation_is_complete() on the joined text once the generator is
+    exhausted (st.write_stream returns it).
+    """
+    with span("groq.turn", mode="stream") as s:
+        start = time.perf_counter()
+        stream = create_turn(
+            trace=s,
+            messages=build_messages(chat_history, context),
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            stream=True
+        )
+
+        for chunk in _traced_chunks(stream, s, start):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def _traced_chunks(stream, s, start):
+    """Pass chunks through, noting time to first chunk and the final usage."""
+    first = True
+    for chunk in stream:
+        if first:
+            s.set(first_token_ms=round((time.perf_counter() - start) * 1000, 3))
+            first = False
+        if getattr(chunk, "x_groq", None) is not None:
+            s.record(chunk)
+        yield chunk
+
+
+# ============================================================
+# Structured turns: reply + readiness + trait deltas in one call
+# ============================================================
+# Set SPARK_STRUCTURED_TURNS=0 to go back to plain-text turns, trigger
+# phrases and a separate Nova trait extraction.
+STRUCTURED_TURNS = os.getenv("SPARK_STRUCTURED_TURNS", "1") != "0"
+STRUCTURED_MAX_TOKENS = 700   # reply + trait JSON
+
+STRUCTURED_SYSTEM_PROMPT = SYSTEM_PROMPT + f"""
+Always answer with ONE JSON object and nothing else, with "reply" first:
+{{
+  "reply": "your message to the student",
+  "ready": false,
+  "traits": {TRAIT_JSON_FORMAT}
+}}
+"reply": what you say to the student (when ready, it gives the 3 careers).
+"ready": true only in the message where you give the 3 careers.
+"traits": score 0-10 ONLY what the student's latest message reveals;
+use 0, [] or "" for everything else.
+"""
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_REPLY_START = re.compile(r'"reply"\s*:\s*"')
+
+
+class _ReplyExtractor:
+    """Decodes the "reply" string out of a JSON object while it streams in."""
+
+    def __init__(self):
+        self.raw = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, chunk):
+        self.raw += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            m = _REPLY_START.search(self.raw)
+            if not m:
+                return ""
+            self._pos = m.end()
+
+        buf, i, out = self.raw, self._pos, []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c == "\\":
+                if i + 1 >= len(buf):
+                    break                       # escape split across chunks
+                e = buf[i + 1]
+                if e == "u":
+                    if i + 6 > len(buf):
+                        break
+                    # a high surrogate needs its low half to decode
+                    width = 12 if "d800" <= buf[i + 2:i + 6].lower() <= "dbff" else 6
+                    if i + width > len(buf):
+                        break
+                    try:
+                        out.append(json.loads('"' + buf[i:i + width] + '"'))
+                    except ValueError:
+                        pass
+                    i += width
+                    continue
+                out.append(_JSON_ESCAPES.get(e, e))
+                i += 2
+                continue
+            out.append(c)
+            i += 1
+
+        self._pos = i
+        return "".join(out)
+
+
+def _parse_turn_json(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(raw[start:end + 1])
+        except ValueError:
+            return None
+
+
+def _clean_traits(traits):
+    """Keep only well-formed fields of the TRAIT_SYSTEM_PROMPT schema."""
+    if not isinstance(traits, dict):
+        return None
+
+    def scores(key, names):
+        raw = traits.get(key) if isinstance(traits.get(key), dict) else {}
+        return {n: raw[n] for n in names if isinstance(raw.get(n), (int, float))}
+
+    signals = traits.get("passion_signals")
+    return {
+        "transferable_skills": scores("transferable_skills", SKILL_NAMES),
+        "interests": scores("interests", INTEREST_NAMES),
+        "passion_signals": [s for s in signals if isinstance(s, str) and s] if isinstance(signals, list) else [],
+        "work_experience_summary": str(traits.get("work_experience_summary") or ""),
+        "vibe_summary": str(traits.get("vibe_summary") or ""),
+    }
+
+
+def _apply_turn_json(data, reply_fallback):
+    """(reply, ready, traits) from a parsed turn, falling back to plain text."""
+    if not isinstance(data, dict) or not isinstance(data.get("reply"), str):
+        reply = reply_fallback.strip()
+        return reply, conversation_is_complete(reply), None
+
+    return data["reply"], data.get("ready") is True, _clean_traits(data.get("traits"))
+
+
+def run_spark_turn_structured(chat_history, context=None):
+    """One Groq call → (reply, ready, trait_delta). JSON mode, no streaming."""
+    with span("groq.turn", mode="structured") as s:
+        response = create_turn(
+            trace=s,
+            messages=build_messages(chat_history, context, structured=True),
+            max_tokens=STRUCTURED_MAX_TOKENS,
+            temperature=TEMPERATURE,
+            response_format={"type": "json_object"}
+        )
+        s.record(response)
+    raw = response.choices[0].message.content or ""
+    return _apply_turn_json(_parse_turn_json(raw), raw)
+
+
+class StructuredTurn:
+    """Streaming structured turn.
+
+    Iterate it (e.g. with st.write_stream) to get the reply text as it is
+    generated; afterwards .reply, .ready and .traits hold the parsed turn.
+    Groq's JSON mode can't stream, so the format is enforced by the prompt
+    and anything unparseable is treated as a plain-text reply.
+    """
+
+    def __init__(self, chat_history, context=None):
+        self.chat_history = chat_history
+        self.context = context
+        self.reply = ""
+        self.ready = False
+        self.traits = None
+
+    def __iter__(self):
+        with span("groq.turn", mode="structured_stream") as s:
+            start = time.perf_counter()
+            stream = create_turn(
+                trace=s,
+                messages=build_messages(self.chat_history, self.context, structured=True),
+                max_tokens=STRUCTURED_MAX_TOKENS,
+                temperature=TEMPERATURE,
+                stream=True
+            )
+
+            extractor = _ReplyExtractor()
+            for chunk in _traced_chunks(stream, s, start):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    text = extractor.feed(delta)
+                    if text:
+                        self.reply += text
+                        yield text
+
+        streamed = self.reply
+        # cut-off / malformed JSON: keep the reply text already shown, not the raw blob
+        self.reply, self.ready, self.traits = _apply_turn_json(
+            _parse_turn_json(extractor.raw), streamed or extractor.raw
+        )
+        if not streamed and self.reply:
+            yield self.reply                   # model ignored the format
+
+
+def stream_spark_turn_structured(chat_history, context=None):
+    return StructuredTurn(chat_history, context)
+
+
+# ============================================================
+# Rolling summary of older turns
+# ============================================================
+SUMMARY_PROMPT = """
+You keep running notes on a chat between Spark (a career coach) and a student.
+Update the notes with the new messages. Keep every concrete fact about the
+student's interests, skills, jobs, and goals. Max 120 words. Notes only.
+"""
+
+
+def summarize_turns(previous_summary, messages):
+    transcript = "\n".join(
+        f"{'Student' if m['role'] == 'user' else 'Spark'}: {m['content']}"
+        for m in messages
+    )
+    with span("groq.summary") as s:
+        acquire("groq", MODEL_ID)
+        response = get_client().chat.completions.create(
+            model=MODEL_ID,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Current notes:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            max_tokens=200,
+            temperature=0.2
+        )
+        s.record(response)
+    # None / "" on an empty completion — the context treats it as a failure
+    return response.choices[0].message.content or ""
+
+
+def new_conversation_context(**kwargs):
+    """Per-session context manager; call .update_async(chat_history) after each turn."""
+    return ConversationContext(summarize_turns, **kwargs)
+
+
 # ============================================================
 # Export symbols
 # ============================================================
-__all__ = ["run_spark_turn", "conversation_is_complete"]
+__all__ = [
+    "run_spark_turn",
+    "stream_spark_turn",
+    "run_spark_turn_structured",
+    "stream_spark_turn_structured",
+    "STRUCTURED_TURNS",
+    "conversation_is_complete",
+    "new_conversation_context",
+]
 
 
 
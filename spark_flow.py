@@ -0,0 +1,92 @@
+# spark_flow.py
+from match_student_to_careers import merge_traits
+from results_pipeline import run_results_pipeline, save_results_async
+from spark_conversation import (
+    STRUCTURED_TURNS,
+    conversation_is_complete,
+    stream_spark_turn,
+    stream_spark_turn_structured,
+)
+
+
+# ============================================================
+#  CAREER EXPLORER FLOW (UI-free)
+# ============================================================
+# The chat → results → save steps of 1_Career_Explorer.py, shared with
+# load_test.py so the load test exercises exactly what the page does.
+# The page supplies its widgets as callbacks (render, build); everything
+# else — call order, profiler submits, context folding — lives here.
+
+GREETING = (
+    "Hey, I’m Spark ✨ Tell me about something creative you naturally "
+    "gravitate toward—TikToks, dance, music, fashion, film, design… "
+    "whatever feels most you."
+)
+
+# how long to wait for an in-flight speculative pass before
+# falling back to the full pipeline
+SPECULATIVE_WAIT_SECONDS = 10
+
+
+def run_turn(chat_history, context, profiler, traits, render):
+    """One Spark reply to the student message at the end of chat_history.
+
+    render(stream) consumes the token stream and returns the reply text
+    (st.write_stream on the page). Appends the reply to chat_history and
+    returns (ready, traits). Overloaded propagates with the history
+    unchanged apart from the student message.
+    """
+    if STRUCTURED_TURNS:
+        # one Groq call returns the reply, a readiness flag and trait deltas
+        turn = stream_spark_turn_structured(chat_history, context=context)
+        render(turn)
+        reply, ready = turn.reply, turn.ready
+        if turn.traits:
+            traits = merge_traits(traits, turn.traits)
+
+        # no Nova call needed when the chat model supplied traits
+        chat_history.append({"role": "assistant", "content": reply})
+        profiler.submit(chat_history, traits=traits)
+    else:
+        # start profiling the new message while Spark is replying
+        profiler.submit(chat_history)
+        reply = render(stream_spark_turn(chat_history, context=context))
+        ready = conversation_is_complete(reply)
+        chat_history.append({"role": "assistant", "content": reply})
+
+    # fold older turns into the summary while the student types
+    context.update_async(chat_history)
+    return ready, traits
+
+
+def build_results(chat_history, catalog, traits=None, on_stage=None, top_k=5):
+    """Full results pipeline; on_stage(stage, value) sees each piece as it lands.
+
+    traits from structured turns stand in for the Nova call when present.
+    """
+    results = None
+    for stage, value in run_results_pipeline(chat_history, catalog, top_k=top_k, traits=traits):
+        if on_stage is not None:
+            on_stage(stage, value)
+        if stage == "done":
+            results = value
+    return results
+
+
+def final_results(chat_history, catalog, profiler, traits=None, build=None,
+                  wait=SPECULATIVE_WAIT_SECONDS):
+    """Speculative results if ready within `wait`, else build(chat_history, catalog, traits)."""
+    # usually already computed in the background during the chat
+    results = profiler.results(timeout=wait)
+    if results is None:
+        results = (build or build_results)(chat_history, catalog, traits)
+
+    # results are final — nothing left for the profiler to do
+    profiler.cancel()
+    return results
+
+
+def save_results(user_id, chat_history, results):
+    # background write — not on the critical path
+    if user_id:
+        save_results_async(user_id, chat_history, results)
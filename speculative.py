@@ -0,0 +1,183 @@
+# speculative.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from match_student_to_careers import (
+    build_embedding_payload,
+    build_report,
+    extract_traits,
+    fuse_embeddings,
+    get_embedding_within_budget,
+    infer_persona,
+    match_careers_blended,
+    merge_traits,
+)
+from results_pipeline import trait_profiles_usable, traits_chat
+from tracing import bind
+
+
+# ============================================================
+#  SPECULATIVE PROFILING
+# ============================================================
+# After every student message we fold the new text into a running profile
+# in the background (while Groq is still writing Spark's reply):
+#
+#   traits     Nova on the new messages only, merged into the profile —
+#              or the profile the chat model already returned (structured turns)
+#   embedding  Titan on the new messages, length-weighted running mean
+#   matches    text embedding + trait-profile score (or, without career
+#              trait profiles, fused text + trait embedding) against the catalog
+#
+# One worker per session at a time. Messages that arrive while it is busy
+# are batched into its next pass, and a pass that has been overtaken skips
+# the trait-embedding / match step the next pass will redo anyway.
+
+_profile_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="spark-speculate")
+# model calls a worker fans out; separate so workers can't starve each other
+_call_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="spark-speculate-call")
+
+
+class SpeculativeProfiler:
+    def __init__(self, catalog, top_k=5, trait_weight=0.5):
+        self.catalog = catalog
+        self.top_k = top_k
+        self.trait_weight = trait_weight
+
+        self._cond = threading.Condition()
+        self._messages = []        # every user message seen so far
+        self._processed = 0        # how many of them are in the profile
+        self._given_traits = None  # cumulative profile from structured turns
+        self._running = False
+        self._cancelled = False
+        self.error = None
+
+        self.traits = None
+        self._emb_sum = None
+        self._emb_weight = 0.0
+        self.matches = None
+        self._matched_upto = 0     # messages reflected in self.matches
+
+    # --------------------------------------------------------
+    #  producer side (page script)
+    # --------------------------------------------------------
+    def submit(self, chat_history, traits=None):
+        """Schedule profiling for any user messages not seen yet.
+
+        If the chat model already returned the student's trait profile
+        (structured turns), pass it as `traits` and the Nova call is skipped.
+        """
+        user_msgs = [m["content"] for m in chat_history if m["role"] == "user"]
+
+        with self._cond:
+            if self._cancelled or len(user_msgs) <= len(self._messages):
+                return                       # nothing new — dedupe
+            self._messages = user_msgs
+            self._given_traits = traits
+            if self._running:
+                return                       # the busy worker picks it up
+            self._running = True
+
+        _profile_pool.submit(bind(self._work))
+
+    def cancel(self):
+        """Stop after the current step; later submits are ignored."""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    # --------------------------------------------------------
+    #  worker
+    # --------------------------------------------------------
+    def _work(self):
+        while True:
+            with self._cond:
+                batch = self._messages[self._processed:]
+                if self._cancelled or not batch:
+                    # same critical section as the check, so a submit() that
+                    # sees _running=True is guaranteed to be picked up
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+                upto = len(self._messages)
+                given = self._given_traits
+
+            try:
+                self._fold(batch, upto, given)
+            except Exception as e:
+                self.error = e
+                print(f"Speculative profiling failed: {e}")
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+                return
+
+    def _fold(self, batch, upto, given=None):
+        text = " ".join(batch)
+
+        # Nova and Titan for the new text run side by side
+        traits_f = None if given else _call_pool.submit(bind(extract_traits), traits_chat(text))
+        emb = get_embedding_within_budget(text)
+        if emb is None:
+            if traits_f:
+                traits_f.cancel()
+            raise RuntimeError("Titan unavailable")   # the results step falls back
+        emb = np.asarray(emb, dtype=np.float32)
+        delta = traits_f.result() if traits_f else None
+
+        weight = float(len(text))
+        emb = emb / (np.linalg.norm(emb) or 1.0)
+
+        with self._cond:
+            self.traits = given if given else merge_traits(self.traits, delta)
+            self._emb_sum = emb * weight if self._emb_sum is None else self._emb_sum + emb * weight
+            self._emb_weight += weight
+            self._processed = upto
+            superseded = len(self._messages) > upto or self._cancelled
+            traits = self.traits
+            text_emb = self._emb_sum / self._emb_weight
+
+        if superseded:
+            return                           # the next pass refreshes matches
+
+        # with career trait profiles the traits are scored locally — no second Titan call
+        if not trait_profiles_usable(self.catalog):
+            trait_emb = get_embedding_within_budget(build_embedding_payload(traits))
+            if trait_emb is None:
+                raise RuntimeError("Titan unavailable")
+            text_emb = fuse_embeddings(text_emb, trait_emb, self.trait_weight)
+        matches = match_careers_blended(text_emb, traits, self.catalog, top_k=self.top_k)
+
+        with self._cond:
+            self.matches = matches
+            self._matched_upto = upto
+            self._cond.notify_all()
+
+    # --------------------------------------------------------
+    #  consumer side
+    # --------------------------------------------------------
+    def results(self, timeout=None):
+        """Results for every message submitted so far, or None.
+
+        Waits up to `timeout` seconds for in-flight work; returns None if it
+        did not finish, failed, or never ran (caller runs the full pipeline).
+        """
+        with self._cond:
+            done = self._cond.wait_for(
+                lambda: self._matched_upto == len(self._messages) or not self._running,
+                timeout=timeout
+            )
+            if not done or not self._messages or self._matched_upto != len(self._messages):
+                return None
+
+            traits = self.traits
+            matches = self.matches
+            user_text = " ".join(self._messages)
+
+        return {
+            "traits": traits,
+            "matches": matches,
+            "persona": infer_persona(traits, user_text),
+            "report": build_report(traits, matches),
+        }
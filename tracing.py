@@ -0,0 +1,253 @@
+# tracing.py
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ============================================================
+#  CONFIG
+# ============================================================
+# SPARK_TRACE=1 turns spans on; they are appended to SPARK_TRACE_FILE as
+# one JSON object per line. With tracing off, span() hands back a shared
+# no-op object, so instrumented code pays one function call per stage.
+
+ENABLED = os.getenv("SPARK_TRACE", "0") == "1"
+TRACE_PATH = os.getenv("SPARK_TRACE_FILE", os.path.join(BASE_DIR, "spark_traces.jsonl"))
+
+FLUSH_EVERY = 50          # spans
+FLUSH_INTERVAL = 2.0      # seconds
+
+# Stages in the order a session hits them (operator view column order)
+STAGES = (
+    "groq.turn",
+    "groq.summary",
+    "nova.traits",
+    "titan.embed",
+    "match",
+    "dynamo.update_user",
+)
+
+_session = contextvars.ContextVar("spark_trace_session", default=None)
+
+
+def set_session(session_id):
+    """Tag every span started from this thread/context with session_id."""
+    _session.set(session_id)
+
+
+def current_session():
+    return _session.get()
+
+
+def bind(fn):
+    """fn wrapped to run in a copy of the caller's context (for thread pools).
+
+    Always copied, tracing or not: admission control queues by session.
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+# ============================================================
+#  SPANS
+# ============================================================
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def record(self, response):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "session", "ts", "_start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.session = _session.get()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self, response):
+        """Pick token counts and retry attempts out of a Groq / Bedrock / DynamoDB response."""
+        self.attrs.update(response_attrs(response))
+
+    def __enter__(self):
+        self.ts = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            "ts": round(self.ts, 3),
+            "session": self.session,
+            "span": self.name,
+            "ms": round((time.perf_counter() - self._start) * 1000, 3),
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        _exporter.add(record)
+        return False
+
+
+def span(name, **attrs):
+    """with span("titan.embed", chars=len(text)) as s: ...; s.record(response)"""
+    if not ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def response_attrs(response):
+    attrs = {}
+    if isinstance(response, dict):
+        usage = response.get("usage") or {}
+        if "inputTokens" in usage:
+            attrs["tokens_in"] = usage["inputTokens"]
+            attrs["tokens_out"] = usage.get("outputTokens", 0)
+        retries = (response.get("ResponseMetadata") or {}).get("RetryAttempts")
+        if retries is not None:
+            attrs["retries"] = retries
+        return attrs
+
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        # last chunk of a Groq stream carries usage under x_groq
+        usage = getattr(getattr(response, "x_groq", None), "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        attrs["tokens_in"] = usage.prompt_tokens
+        attrs["tokens_out"] = usage.completion_tokens
+    return attrs
+
+
+# ============================================================
+#  JSONL EXPORT
+# ============================================================
+
+class JsonlExporter:
+    """Buffers finished spans and appends them to a JSONL file in batches."""
+
+    def __init__(self, path):
+        self.path = path
+        self.recent = deque(maxlen=2000)     # in-process view, newest last
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, record):
+        with self._lock:
+            self.recent.append(record)
+            self._buffer.append(record)
+            due = (len(self._buffer) >= FLUSH_EVERY
+                   or time.monotonic() - self._last_flush > FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not batch:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(r, default=str) + "\n" for r in batch))
+            except OSError as e:
+                print(f"Writing traces to {self.path} failed: {e}")
+
+
+_exporter = JsonlExporter(TRACE_PATH)
+atexit.register(_exporter.flush)
+
+
+def flush():
+    _exporter.flush()
+
+
+# ============================================================
+#  READING TRACES BACK (operator view)
+# ============================================================
+
+def load_spans(path=None, limit=50_000):
+    """The newest `limit` spans from the JSONL file (plus unflushed ones)."""
+    path = path or TRACE_PATH
+    spans = deque(maxlen=limit)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue                       # torn last line
+    if path == _exporter.path:
+        with _exporter._lock:
+            spans.extend(_exporter._buffer)
+    return list(spans)
+
+
+def recent_sessions(spans, n=20):
+    """Session ids of the last n sessions that produced spans, newest first."""
+    last_seen = {}
+    for s in spans:
+        if s.get("session"):
+            last_seen[s["session"]] = max(s["ts"], last_seen.get(s["session"], 0))
+    return sorted(last_seen, key=last_seen.get, reverse=True)[:n]
+
+
+def stage_percentiles(spans):
+    """Per-stage count / errors / mean / p50 / p95 / p99 (ms) and token totals."""
+    import numpy as np
+
+    by_stage = defaultdict(list)
+    for s in spans:
+        by_stage[s["span"]].append(s)
+
+    rows = []
+    order = list(STAGES) + sorted(set(by_stage) - set(STAGES))
+    for stage in order:
+        group = by_stage.get(stage)
+        if not group:
+            continue
+        ms = np.array([s["ms"] for s in group])
+        rows.append({
+            "stage": stage,
+            "count": len(group),
+            "errors": sum(1 for s in group if "error" in s),
+            "retries": sum(s.get("retries", 0) for s in group),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "tokens_in": sum(s.get("tokens_in", 0) for s in group),
+            "tokens_out": sum(s.get("tokens_out", 0) for s in group),
+        })
+    return rows
+
+
+def session_breakdown(spans, sessions):
+    """{session: {stage: total ms}} for the given session ids."""
+    wanted = set(sessions)
+    out = {sid: defaultdict(float) for sid in sessions}
+    for s in spans:
+        if s.get("session") in wanted:
+            out[s["session"]][s["span"]] += s["ms"]
+    return {sid: dict(stages) for sid, stages in out.items()}